@@ -0,0 +1,146 @@
+"""
+Measures breadth-first search throughput, in nodes expanded per second,
+of the frontier and node classes in util against the original
+list-backed frontier and dict-backed nodes, on a dataset directory and
+on a synthetic graph.
+
+Usage: python benchmark.py [directory] [--people N] [--movies N] [--cast N]
+"""
+
+import argparse
+import random
+import time
+from array import array
+
+from graph import INDEX, Graph, compress
+from snapshot import load_graph
+from util import Node, QueueFrontier
+
+
+class ListNode():
+    def __init__(self, state, parent, action):
+        self.state = state
+        self.parent = parent
+        self.action = action
+
+
+class ListFrontier():
+    def __init__(self):
+        self.frontier = []
+
+    def add(self, node):
+        self.frontier.append(node)
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier[0]
+            self.frontier = self.frontier[1:]
+            return node
+
+
+IMPLEMENTATIONS = [
+    ("list frontier, dict nodes", ListNode, ListFrontier),
+    ("deque frontier, slotted nodes", Node, QueueFrontier)
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [directory] "
+              "[--people N] [--movies N] [--cast N]"
+    )
+    parser.add_argument("directory", nargs="?", default="small")
+    parser.add_argument("--people", type=int, default=100000)
+    parser.add_argument("--movies", type=int, default=40000)
+    parser.add_argument("--cast", type=int, default=4)
+    args = parser.parse_args()
+
+    graphs = [
+        (args.directory, load_graph(args.directory)),
+        (f"synthetic ({args.people} people, {args.movies} movies)",
+         synthetic_graph(args.people, args.movies, args.cast))
+    ]
+    for name, graph in graphs:
+        print(name)
+        for label, node, frontier in IMPLEMENTATIONS:
+            expanded, seconds = measure(graph, node, frontier)
+            print(f"    {label}: {expanded} nodes in {seconds:.3f}s, "
+                  f"{expanded / seconds:,.0f} nodes/sec")
+
+
+def synthetic_graph(people, movies, cast, seed=0):
+    """
+    Returns a random graph where each movie stars `cast` people, chosen
+    with a bias towards a few prolific actors.
+    """
+    generator = random.Random(seed)
+    edges = set()
+    for movie in range(movies):
+        for _ in range(cast):
+            person = int(people * generator.random() ** 2)
+            edges.add(person * movies + movie)
+
+    person_offsets, person_movies = compress(sorted(edges), people, movies)
+    movie_offsets, movie_stars = compress(
+        sorted((edge % movies) * people + edge // movies for edge in edges),
+        movies, people
+    )
+    order = array(INDEX, range(max(people, movies)))
+    return Graph(
+        [str(person) for person in range(people)],
+        [f"Person {person}" for person in range(people)],
+        [""] * people,
+        [str(movie) for movie in range(movies)],
+        [f"Movie {movie}" for movie in range(movies)],
+        [""] * movies,
+        person_offsets, person_movies, movie_offsets, movie_stars,
+        person_order=order[:people], movie_order=order[:movies],
+        name_order=order[:people]
+    )
+
+
+def measure(graph, node, frontier, minimum=0.5):
+    """
+    Repeats full searches from every person in turn until `minimum`
+    seconds have passed, returning nodes expanded and seconds taken.
+    """
+    expanded = 0
+    start = time.perf_counter()
+    source = 0
+    while True:
+        expanded += search(graph, source, node, frontier)
+        source = (source + 1) % len(graph.person_ids)
+        seconds = time.perf_counter() - start
+        if seconds >= minimum:
+            return expanded, seconds
+
+
+def search(graph, source, node_class, frontier_class):
+    """
+    Breadth-first search over the whole component of `source`,
+    returning the number of nodes expanded.
+    """
+    frontier = frontier_class()
+    frontier.add(node_class(state=source, parent=None, action=None))
+    explored = {source}
+    expanded = 0
+    while not frontier.empty():
+        node = frontier.remove()
+        expanded += 1
+        for movie in graph.movies_of(node.state):
+            for person in graph.stars_of(movie):
+                if person not in explored:
+                    explored.add(person)
+                    frontier.add(
+                        node_class(state=person, parent=node, action=movie)
+                    )
+    return expanded
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
-import csv
+import argparse
+import functools
+import multiprocessing
+import os
 import sys
 
+from graph import MoviesView, NamesView, PeopleView, histogram
+from landmarks import LandmarkIndex
+from lookup import NameIndex
+from snapshot import append_journal, load_graph, read_delta
 from util import Node, QueueFrontier
 
+# Compact, integer-indexed graph of people and movies, and its directory
+graph = None
+data_directory = None
+
+# Optional landmark distance index over the graph
+landmark_index = None
+
+# Prefix and typo-tolerant name lookup over the graph
+name_index = None
+
 # Maps names to a set of corresponding person_ids
 names = {}
 
@@ -12,85 +29,276 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# Ways of choosing between several people with the same name
+POLICIES = ("ask", "none", "all", "oldest", "youngest", "most-movies")
 
-def load_data(directory):
+
+def load_data(directory, landmarks=False):
     """
     Load data from CSV files into memory.
+
+    The data is held in a compact graph; `names`, `people` and `movies`
+    are read-only views over it. The graph is cached in a snapshot file
+    next to the CSV files and memory-mapped on later runs.
+
+    With `landmarks`, also load (or build and save) the landmark index
+    used by `degree_bounds` and goal-directed `shortest_path`.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    global graph, names, people, movies, landmark_index, name_index
+    global data_directory
+    data_directory = directory
+    graph = load_graph(directory)
+    name_index = NameIndex(graph)
+    names = NamesView(graph)
+    people = PeopleView(graph)
+    movies = MoviesView(graph)
+    landmark_index = None
+    if landmarks:
+        landmark_index = LandmarkIndex.load_or_build(graph, directory)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--batch FILE] [--workers N] "
+              "[--landmarks] [--sweep NAME [--vectorized]] [--components] "
+              "[--complete PREFIX] [--fuzzy] [--ambiguous POLICY] "
+              "[--count] [--ingest DELTA]"
+    )
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE "
+                             "('-' for stdin), one result line per pair")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes used by --batch")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="use a landmark index to bound and direct "
+                             "the search")
+    parser.add_argument("--sweep", metavar="NAME",
+                        help="count everyone by degrees of separation "
+                             "from NAME")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="expand --sweep levels with NumPy")
+    parser.add_argument("--components", action="store_true",
+                        help="report the sizes of the connected components")
+    parser.add_argument("--complete", metavar="PREFIX",
+                        help="list people whose name starts with PREFIX")
+    parser.add_argument("--fuzzy", action="store_true",
+                        help="fall back to the closest names on a typo")
+    parser.add_argument("--ambiguous", default="none",
+                        choices=[policy for policy in POLICIES
+                                 if policy not in ("ask", "all")],
+                        help="how --batch chooses between people with the "
+                             "same name")
+    parser.add_argument("--count", action="store_true",
+                        help="also count the distinct shortest paths")
+    parser.add_argument("--ingest", metavar="DELTA",
+                        help="add the people, movies and stars in the CSV "
+                             "files of directory DELTA")
+    args = parser.parse_args()
 
     # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    print("Loading data...", file=sys.stderr if args.batch else sys.stdout)
+    load_data(args.directory, landmarks=args.landmarks)
+    print("Data loaded.", file=sys.stderr if args.batch else sys.stdout)
+
+    if args.ingest:
+        count = ingest(args.ingest)
+        print(f"Ingested {count} records.")
+        return
+
+    if args.batch:
+        if args.batch == "-":
+            batch(sys.stdin, sys.stdout, args.directory, args.workers,
+                  policy=args.ambiguous, fuzzy=args.fuzzy)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                batch(f, sys.stdout, args.directory, args.workers,
+                      policy=args.ambiguous, fuzzy=args.fuzzy)
+        return
 
-    source = person_id_for_name(input("Name: "))
+    if args.complete:
+        for person in name_index.complete(args.complete):
+            name = graph.person_names[person]
+            birth = graph.person_births[person]
+            print(f"ID: {graph.person_ids[person]}, Name: {name}, "
+                  f"Birth: {birth}")
+        return
+
+    if args.components:
+        sizes = graph.component_histogram()
+        print(f"{sum(sizes.values())} connected components.")
+        for size, count in sizes.items():
+            print(f"{count} of {size} people")
+        return
+
+    if args.sweep:
+        source = person_id_for_name(args.sweep, fuzzy=args.fuzzy)
+        if source is None:
+            sys.exit("Person not found.")
+        distances = sweep(source, vectorized=args.vectorized)[0]
+        for distance, count in histogram(distances).items():
+            if distance < 0:
+                print(f"Not connected: {count}")
+            else:
+                print(f"{distance} degrees of separation: {count}")
+        return
+
+    source = person_id_for_name(input("Name: "), fuzzy=args.fuzzy)
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_id_for_name(input("Name: "), fuzzy=args.fuzzy)
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if landmark_index is not None:
+        lower, upper = degree_bounds(source, target)
+        print(f"Landmark estimate: {lower} to {upper} degrees of separation.")
+
+    path = shortest_path(source, target, goal_directed=args.landmarks)
+
+    for line in describe_path(source, path):
+        print(line)
+    if args.count and path is not None:
+        print(f"{count_shortest_paths(source, target)} shortest paths.")
+
+
+def ingest(delta):
+    """
+    Adds the people, movies and stars in whichever of people.csv,
+    movies.csv and stars.csv exist in the directory `delta` to the loaded
+    data, in time proportional to the delta.
 
+    The component labels and any loaded landmark index are patched rather
+    than rebuilt, and the records are appended to the journal next to the
+    snapshot so that later runs load them too. Returns the record count.
+    """
+    records = list(read_delta(delta))
+    movies = graph.apply(records)
+    if landmark_index is not None:
+        landmark_index.update(graph, movies)
+    append_journal(data_directory, records)
+    return len(records)
+
+
+def describe_path(source, path):
+    """
+    Returns the lines describing a path found by `shortest_path`.
+    """
     if path is None:
-        print("Not connected.")
-    else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        return ["Not connected."]
+    degrees = len(path)
+    lines = [f"{degrees} degrees of separation."]
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = person_name(path[i][1])
+        person2 = person_name(path[i + 1][1])
+        movie = movie_title(path[i + 1][0])
+        lines.append(f"{i + 1}: {person1} and {person2} starred in {movie}")
+    return lines
+
+
+def person_name(person_id):
+    """
+    Returns a person's name without building their set of movies.
+    """
+    return graph.person_names[graph.person_index(person_id)]
+
+
+def movie_title(movie_id):
+    """
+    Returns a movie's title without building its set of stars.
+    """
+    return graph.movie_titles[graph.movie_index(movie_id)]
+
+
+def batch(lines, output, directory, workers, policy="none", fuzzy=False):
+    """
+    Answers every "source<TAB>target" line of `lines`, writing one
+    tab-separated result line per pair to `output` in input order.
+    Names are resolved without prompting, as by `person_ids_for_name`
+    and `choose_person` with `policy`.
+
+    Queries are spread over a pool of `workers` processes. Forked workers
+    share the loaded graph copy-on-write; otherwise each worker maps the
+    same snapshot file, so the graph pages are shared through the OS.
+    """
+    pairs = (line.rstrip("\n").split("\t") for line in lines if line.strip())
+    answer_pair = functools.partial(answer, policy=policy, fuzzy=fuzzy)
+    if workers is None or workers <= 1:
+        for result in map(answer_pair, pairs):
+            print(result, file=output)
+        return
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "fork" if "fork" in methods else None
+    )
+    with context.Pool(workers, initializer=load_worker,
+                      initargs=(directory, landmark_index is not None)) as pool:
+        for result in pool.imap(answer_pair, pairs, chunksize=64):
+            print(result, file=output)
+
+
+def load_worker(directory, landmarks):
+    """
+    Loads the data in a worker process, unless it was inherited on fork.
+    """
+    if graph is None:
+        load_data(directory, landmarks=landmarks)
+
+
+def answer(pair, policy="none", fuzzy=False):
+    """
+    Returns the result line for a (source name, target name) pair.
+    """
+    if len(pair) != 2:
+        return "\t".join(pair + ["Expected two tab-separated names."])
+    person_ids = []
+    for name in pair:
+        candidates = person_ids_for_name(name.strip(), fuzzy=fuzzy)
+        if len(candidates) == 0:
+            return "\t".join(pair + ["Person not found."])
+        person_id = choose_person(candidates, policy)
+        if person_id is None:
+            return "\t".join(pair + [f"Ambiguous name: {name}."])
+        person_ids.append(person_id)
+    source, target = person_ids
+    path = shortest_path(source, target,
+                         goal_directed=landmark_index is not None)
+    return "\t".join(pair + describe_path(source, path))
 
 
-def shortest_path(source, target):
+def shortest_path(source, target, bidirectional=True, goal_directed=False):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If no possible path, returns None; people in different connected
+    components are answered without searching.
+
+    By default the search grows from both ends at once; pass
+    `bidirectional=False` for a plain breadth-first search from the source.
+    With `goal_directed` and a loaded landmark index, the search is an
+    A* search guided and pruned by the landmark bounds instead.
     """
+    if not connected(source, target):
+        return None
+
+    goal_directed = goal_directed and landmark_index is not None
+    if goal_directed or bidirectional:
+        source_index = graph.person_index(source)
+        target_index = graph.person_index(target)
+        if goal_directed:
+            path = landmark_index.shortest_path(
+                graph, source_index, target_index
+            )
+        else:
+            path = graph.shortest_path(source_index, target_index)
+        if path is None:
+            return None
+        return [(graph.movie_ids[movie], graph.person_ids[person])
+                for movie, person in path]
+
     # Initialize frontier with the start node
     start = Node(state=source, parent=None, action=None)
     frontier = QueueFrontier()
@@ -124,14 +332,81 @@ def shortest_path(source, target):
         explored.add(node.state)
 
 
-def person_id_for_name(name):
+def count_shortest_paths(source, target):
+    """
+    Returns the number of distinct shortest lists of (movie_id, person_id)
+    pairs that connect the source to the target, without listing them.
+    """
+    return graph.count_shortest_paths(
+        graph.person_index(source), graph.person_index(target)
+    )[0]
+
+
+def all_shortest_paths(source, target):
+    """
+    Yields every shortest list of (movie_id, person_id) pairs that
+    connect the source to the target, one at a time.
+    """
+    paths = graph.all_shortest_paths(
+        graph.person_index(source), graph.person_index(target)
+    )
+    for path in paths:
+        yield [(graph.movie_ids[movie], graph.person_ids[person])
+               for movie, person in path]
+
+
+def sweep(source, vectorized=False):
+    """
+    Returns, in one breadth-first pass from a person_id, arrays of the
+    degrees of separation to every person (-1 if not connected) and of the
+    parent person and connecting movie on a shortest path back to the
+    source. The arrays are indexed like `graph.person_ids`, and
+    `graph.path_to` turns them into a path.
+
+    With `vectorized`, levels are expanded with NumPy array operations.
+    """
+    return graph.sweep(graph.person_index(source), vectorized=vectorized)
+
+
+def connected(source, target):
+    """
+    Returns True if two person_ids are in the same connected component.
+    """
+    return graph.connected(
+        graph.person_index(source), graph.person_index(target)
+    )
+
+
+def degree_bounds(source, target):
+    """
+    Returns lower and upper bounds on the degrees of separation between
+    two person_ids from the landmark index, without searching.
+
+    Both bounds are math.inf if the people are known not to be connected.
+    """
+    if landmark_index is None:
+        raise Exception("landmark index not loaded")
+    return landmark_index.bounds(
+        graph.person_index(source), graph.person_index(target)
+    )
+
+
+def person_id_for_name(name, policy="ask", birth=None, fuzzy=False):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    Candidates are found as by `person_ids_for_name`. With several, the
+    "ask" policy prompts for the intended id, "all" returns the list of
+    every candidate id, and any other policy is applied by `choose_person`.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name, birth=birth, fuzzy=fuzzy)
+    if policy == "all":
+        return person_ids
     if len(person_ids) == 0:
         return None
+    elif len(person_ids) > 1 and policy != "ask":
+        return choose_person(person_ids, policy)
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
@@ -150,16 +425,73 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def person_ids_for_name(name, birth=None, fuzzy=False):
+    """
+    Returns the sorted IMDB ids of everyone with a name, optionally only
+    those born in the year `birth`.
+
+    With `fuzzy`, a name nobody has falls back to the names closest to it,
+    within two edits.
+    """
+    person_ids = sorted(names.get(name.lower(), set()))
+    if len(person_ids) == 0 and fuzzy:
+        matches = name_index.fuzzy(name, limit=None)
+        person_ids = sorted(graph.person_ids[person]
+                            for distance, person in matches
+                            if distance == matches[0][0])
+    if birth is not None:
+        person_ids = [person_id for person_id in person_ids
+                      if person_birth(person_id) == str(birth)]
+    return person_ids
+
+
+def choose_person(person_ids, policy):
+    """
+    Chooses one of several IMDB ids without prompting: "oldest" and
+    "youngest" by birth year, "most-movies" by number of movies, and
+    "none" returns None unless there is only one.
+    """
+    if len(person_ids) == 1:
+        return person_ids[0]
+
+    def year(person_id):
+        birth = person_birth(person_id)
+        return int(birth) if birth.isdigit() else None
+
+    if policy == "oldest":
+        return min(person_ids, key=lambda person_id: (
+            year(person_id) is None, year(person_id) or 0
+        ))
+    if policy == "youngest":
+        return max(person_ids, key=lambda person_id: (
+            year(person_id) is not None, year(person_id) or 0
+        ))
+    if policy == "most-movies":
+        return max(person_ids, key=lambda person_id: len(
+            graph.movies_of(graph.person_index(person_id))
+        ))
+    if policy == "none":
+        return None
+    raise ValueError(f"unknown policy: {policy}")
+
+
+def person_birth(person_id):
+    """
+    Returns a person's birth year as a string, empty if unknown.
+    """
+    return graph.person_births[graph.person_index(person_id)]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in graph.movies_of(graph.person_index(person_id)):
+        movie_id = graph.movie_ids[movie]
+        for person in graph.stars_of(movie):
+            neighbors.add((movie_id, graph.person_ids[person]))
     return neighbors
 
 
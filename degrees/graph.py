@@ -0,0 +1,828 @@
+import csv
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Type code of every index array in the graph (signed 64-bit integers)
+INDEX = "q"
+
+
+class Graph():
+    """
+    People and movies interned into dense integers, with the star edges
+    stored in both directions as CSR offset + index arrays:
+
+    the movies of person `p` are
+        person_movies[person_offsets[p]:person_offsets[p + 1]]
+    and the stars of movie `m` are
+        movie_stars[movie_offsets[m]:movie_offsets[m + 1]].
+
+    People, movies and stars added after loading (see `add_person`,
+    `add_movie` and `add_star`) are kept in dictionaries alongside the
+    arrays, so that an update costs time proportional to its size.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 person_order=None, movie_order=None, name_order=None,
+                 component_labels=None, component_sizes=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+
+        # Updates since loading: movies added to each person, stars added to
+        # each movie, indices of new ids and names, the component label of
+        # each new person, labels merged into another and updated sizes
+        self.loaded_people = len(person_offsets) - 1
+        self.added_movies = {}
+        self.added_stars = {}
+        self.added_person_index = {}
+        self.added_movie_index = {}
+        self.added_names = {}
+        self.added_labels = {}
+        self.merged_labels = {}
+        self.merged_sizes = {}
+        self.version = 0
+        self.arrays = None
+
+        # Person and movie indices sorted by IMDB id, and people sorted by
+        # lowercase name, so that lookups are binary searches
+        if person_order is None:
+            person_order = array(INDEX, sorted(
+                range(len(person_ids)), key=person_ids.__getitem__
+            ))
+        if movie_order is None:
+            movie_order = array(INDEX, sorted(
+                range(len(movie_ids)), key=movie_ids.__getitem__
+            ))
+        if name_order is None:
+            name_order = array(INDEX, sorted(
+                range(len(person_names)), key=self.lowercase_name
+            ))
+        self.person_order = person_order
+        self.movie_order = movie_order
+        self.name_order = name_order
+
+        # Connected component of each person, labelled by a representative
+        # person, and the size of each component at its representative
+        if component_labels is None or component_sizes is None:
+            component_labels, component_sizes = self.find_components()
+        self.component_labels = component_labels
+        self.component_sizes = component_sizes
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load people, movies and stars from the CSV files in `directory`.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        # Intern ids while reading the edges, dropping duplicates and
+        # edges whose person or movie is unknown
+        person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+        edges = set()
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            for row in reader:
+                try:
+                    person = person_index[row["person_id"]]
+                    movie = movie_index[row["movie_id"]]
+                except KeyError:
+                    continue
+                edges.add(person * len(movie_ids) + movie)
+        del person_index, movie_index
+
+        person_offsets, person_movies = compress(
+            sorted(edges), len(person_ids), len(movie_ids)
+        )
+        movie_offsets, movie_stars = compress(
+            sorted(
+                (edge % len(movie_ids)) * len(person_ids)
+                + edge // len(movie_ids)
+                for edge in edges
+            ),
+            len(movie_ids), len(person_ids)
+        )
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def find_components(self):
+        """
+        Labels the connected components of the graph with union-find,
+        joining every star of a movie to its first star.
+
+        Returns an array of each person's component label and an array of
+        component sizes, non-zero only at the label of each component.
+        """
+        people = len(self.person_offsets) - 1
+        labels = array(INDEX, range(people))
+        sizes = array(INDEX, [1]) * people
+
+        def find(person):
+            while labels[person] != person:
+                labels[person] = labels[labels[person]]
+                person = labels[person]
+            return person
+
+        for movie in range(len(self.movie_offsets) - 1):
+            stars = self.stars_of(movie)
+            if len(stars) < 2:
+                continue
+            root = find(stars[0])
+            for star in stars[1:]:
+                other = find(star)
+                if other == root:
+                    continue
+                if sizes[other] > sizes[root]:
+                    root, other = other, root
+                labels[other] = root
+                sizes[root] += sizes[other]
+                sizes[other] = 0
+
+        for person in range(people):
+            labels[person] = find(person)
+        return labels, sizes
+
+    def component(self, person):
+        """
+        Returns the component label of `person`.
+        """
+        if person < self.loaded_people:
+            label = self.component_labels[person]
+        else:
+            label = self.added_labels[person]
+        while label in self.merged_labels:
+            label = self.merged_labels[label]
+        return label
+
+    def connected(self, source, target):
+        """
+        Returns True if there is a path between two people, in O(1).
+        """
+        return self.component(source) == self.component(target)
+
+    def component_size(self, person):
+        """
+        Returns the number of people in the component of `person`.
+        """
+        return self.label_size(self.component(person))
+
+    def label_size(self, label):
+        if label in self.merged_sizes:
+            return self.merged_sizes[label]
+        return self.component_sizes[label]
+
+    def component_histogram(self):
+        """
+        Returns a dictionary mapping each component size to the number of
+        components of that size, largest first.
+        """
+        counts = {}
+        sizes = list(self.merged_sizes.values())
+        for label, size in enumerate(self.component_sizes):
+            if size and label not in self.merged_sizes:
+                sizes.append(size)
+        for size in sizes:
+            if size:
+                counts[size] = counts.get(size, 0) + 1
+        return dict(sorted(counts.items(), reverse=True))
+
+    def add_person(self, person_id, name, birth):
+        """
+        Adds a person, returning their index (the existing one if the id
+        is already known).
+        """
+        try:
+            return self.person_index(person_id)
+        except KeyError:
+            pass
+        self.person_ids = extendable(self.person_ids)
+        self.person_names = extendable(self.person_names)
+        self.person_births = extendable(self.person_births)
+        person = len(self.person_ids)
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(birth)
+        self.added_person_index[person_id] = person
+        self.added_names.setdefault(name.lower(), []).append(person)
+        self.added_labels[person] = person
+        self.merged_sizes[person] = 1
+        self.version += 1
+        return person
+
+    def add_movie(self, movie_id, title, year):
+        """
+        Adds a movie, returning its index (the existing one if the id is
+        already known).
+        """
+        try:
+            return self.movie_index(movie_id)
+        except KeyError:
+            pass
+        self.movie_ids = extendable(self.movie_ids)
+        self.movie_titles = extendable(self.movie_titles)
+        self.movie_years = extendable(self.movie_years)
+        movie = len(self.movie_ids)
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(year)
+        self.added_movie_index[movie_id] = movie
+        self.version += 1
+        return movie
+
+    def add_star(self, person_id, movie_id):
+        """
+        Adds a person to the stars of a movie, merging their components.
+
+        Returns the movie index, or None if either id is unknown or the
+        person already starred in the movie.
+        """
+        try:
+            person = self.person_index(person_id)
+            movie = self.movie_index(movie_id)
+        except KeyError:
+            return None
+        stars = self.stars_of(movie)
+        if person in stars:
+            return None
+        if len(stars):
+            self.merge_components(person, stars[0])
+        self.added_movies.setdefault(person, []).append(movie)
+        self.added_stars.setdefault(movie, []).append(person)
+        self.version += 1
+        return movie
+
+    def merge_components(self, person, other):
+        label, other_label = self.component(person), self.component(other)
+        if label == other_label:
+            return
+        size, other_size = self.label_size(label), self.label_size(other_label)
+        if size < other_size:
+            label, other_label = other_label, label
+        self.merged_labels[other_label] = label
+        self.merged_sizes[label] = size + other_size
+        self.merged_sizes[other_label] = 0
+
+    def apply(self, records):
+        """
+        Applies ("person", id, name, birth), ("movie", id, title, year) and
+        ("star", person_id, movie_id) records in order.
+
+        Returns the set of movies that gained stars.
+        """
+        movies = set()
+        for kind, *values in records:
+            if kind == "person":
+                self.add_person(*values)
+            elif kind == "movie":
+                self.add_movie(*values)
+            elif kind == "star":
+                movie = self.add_star(*values)
+                if movie is not None:
+                    movies.add(movie)
+        return movies
+
+    def lowercase_name(self, person):
+        return self.person_names[person].lower()
+
+    def person_index(self, person_id):
+        """
+        Returns the dense index of an IMDB person id, or raises KeyError.
+        """
+        if person_id in self.added_person_index:
+            return self.added_person_index[person_id]
+        return find(self.person_order, self.person_ids, person_id)
+
+    def movie_index(self, movie_id):
+        """
+        Returns the dense index of an IMDB movie id, or raises KeyError.
+        """
+        if movie_id in self.added_movie_index:
+            return self.added_movie_index[movie_id]
+        return find(self.movie_order, self.movie_ids, movie_id)
+
+    def people_named(self, name):
+        """
+        Returns the indices of every person whose lowercase name is `name`.
+        """
+        lo = bisect_left(self.name_order, name, key=self.lowercase_name)
+        hi = bisect_right(self.name_order, name, lo, key=self.lowercase_name)
+        if name in self.added_names:
+            return list(self.name_order[lo:hi]) + self.added_names[name]
+        return self.name_order[lo:hi]
+
+    def movies_of(self, person):
+        if person + 1 < len(self.person_offsets):
+            movies = self.person_movies[
+                self.person_offsets[person]:self.person_offsets[person + 1]
+            ]
+        else:
+            movies = ()
+        if person in self.added_movies:
+            return list(movies) + self.added_movies[person]
+        return movies
+
+    def stars_of(self, movie):
+        if movie + 1 < len(self.movie_offsets):
+            stars = self.movie_stars[
+                self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+            ]
+        else:
+            stars = ()
+        if movie in self.added_stars:
+            return list(stars) + self.added_stars[movie]
+        return stars
+
+    def csr_arrays(self):
+        """
+        Returns NumPy person_offsets, person_movies, movie_offsets and
+        movie_stars arrays that include every added star.
+        """
+        if self.arrays is None or self.arrays[0] != self.version:
+            self.arrays = (self.version, (
+                *merge_rows(self.person_offsets, self.person_movies,
+                            self.added_movies, len(self.person_ids)),
+                *merge_rows(self.movie_offsets, self.movie_stars,
+                            self.added_stars, len(self.movie_ids))
+            ))
+        return self.arrays[1]
+
+    def distances(self, source):
+        """
+        Returns an array of the degrees of separation from `source` to
+        every person, with -1 for people who are not connected.
+        """
+        return self.sweep(source)[0]
+
+    def sweep(self, source, vectorized=False):
+        """
+        Breadth-first search from `source` to every person at once.
+
+        Returns three arrays indexed by person: the degrees of separation
+        from `source` (-1 if not connected), and the parent person and
+        connecting movie on one shortest path back to `source` (-1 for
+        `source` and for people who are not connected).
+
+        With `vectorized`, each level is expanded with NumPy gathers over
+        the CSR arrays (a sparse matrix-vector product) and NumPy arrays
+        are returned.
+        """
+        if vectorized:
+            return self.sweep_vectorized(source)
+
+        movies_of, stars_of = self.movies_of, self.stars_of
+        people = len(self.person_ids)
+        distances = array("i", [-1]) * people
+        parents = array(INDEX, [-1]) * people
+        via = array(INDEX, [-1]) * people
+        expanded = bytearray(len(self.movie_ids))
+        distances[source] = 0
+        frontier = [source]
+        level = 0
+        while frontier:
+            level += 1
+            next_frontier = []
+            for person in frontier:
+                for movie in movies_of(person):
+                    if expanded[movie]:
+                        continue
+                    expanded[movie] = 1
+                    for neighbor in stars_of(movie):
+                        if distances[neighbor] < 0:
+                            distances[neighbor] = level
+                            parents[neighbor] = person
+                            via[neighbor] = movie
+                            next_frontier.append(neighbor)
+            frontier = next_frontier
+        return distances, parents, via
+
+    def sweep_vectorized(self, source):
+        if np is None:
+            raise Exception("vectorized sweep requires numpy")
+        person_offsets, person_movies, movie_offsets, movie_stars = (
+            self.csr_arrays()
+        )
+        people = len(person_offsets) - 1
+        distances = np.full(people, -1, dtype=np.int32)
+        parents = np.full(people, -1, dtype=np.int64)
+        via = np.full(people, -1, dtype=np.int64)
+        expanded = np.zeros(len(movie_offsets) - 1, dtype=bool)
+        distances[source] = 0
+        frontier = np.array([source], dtype=np.int64)
+        level = 0
+        while len(frontier):
+            level += 1
+
+            # Movies of the frontier not expanded yet, each with one
+            # frontier person who starred in it
+            rows, movies = gather(person_offsets, person_movies, frontier)
+            fresh = ~expanded[movies]
+            movies, first = np.unique(movies[fresh], return_index=True)
+            owners = frontier[rows[fresh][first]]
+            expanded[movies] = True
+
+            # Stars of those movies not reached yet, each with one movie
+            rows, stars = gather(movie_offsets, movie_stars, movies)
+            fresh = distances[stars] < 0
+            stars, first = np.unique(stars[fresh], return_index=True)
+            rows = rows[fresh][first]
+            distances[stars] = level
+            parents[stars] = owners[rows]
+            via[stars] = movies[rows]
+            frontier = stars
+        return distances, parents, via
+
+    def path_to(self, sweep, target):
+        """
+        Returns the list of (movie, person) index pairs leading from the
+        source of a sweep to `target`, or None if it was not reached.
+        """
+        distances, parents, via = sweep
+        if distances[target] < 0:
+            return None
+        path = []
+        while distances[target] > 0:
+            path.append((int(via[target]), int(target)))
+            target = parents[target]
+        path.reverse()
+        return path
+
+    def shortest_path(self, source, target):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, searching from both ends and
+        always expanding the smaller frontier by a full level.
+
+        If no possible path, returns None.
+        """
+        if source == target:
+            return []
+        if not self.connected(source, target):
+            return None
+
+        # Parent person and connecting movie of every reached person,
+        # with -1 marking the root of each side
+        forward, forward_via = {source: -1}, {source: -1}
+        backward, backward_via = {target: -1}, {target: -1}
+        forward_movies, backward_movies = set(), set()
+        forward_frontier, backward_frontier = [source], [target]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                forward_frontier, meeting = self.expand_level(
+                    forward_frontier, forward, forward_via,
+                    forward_movies, backward
+                )
+            else:
+                backward_frontier, meeting = self.expand_level(
+                    backward_frontier, backward, backward_via,
+                    backward_movies, forward
+                )
+            if meeting is not None:
+                break
+        else:
+            return None
+
+        path = []
+        person = meeting
+        while forward[person] != -1:
+            path.append((forward_via[person], person))
+            person = forward[person]
+        path.reverse()
+        person = meeting
+        while backward[person] != -1:
+            path.append((backward_via[person], backward[person]))
+            person = backward[person]
+        return path
+
+    def count_shortest_paths(self, source, target):
+        """
+        Returns the number of distinct shortest lists of (movie, person)
+        pairs connecting the source to the target, 0 if not connected,
+        and the degrees of separation reached by the search.
+
+        Counts are propagated level by level without listing any path:
+        every movie passes on the summed counts of its stars on the current
+        level to its stars on the next one.
+        """
+        if not self.connected(source, target):
+            return 0, {}
+        distances, counts = {source: 0}, {source: 1}
+        frontier = [source]
+        level = 0
+        while target not in distances:
+            level += 1
+            movie_counts = {}
+            for person in frontier:
+                for movie in self.movies_of(person):
+                    movie_counts[movie] = (
+                        movie_counts.get(movie, 0) + counts[person]
+                    )
+            next_frontier = []
+            for movie, count in movie_counts.items():
+                for neighbor in self.stars_of(movie):
+                    distance = distances.get(neighbor)
+                    if distance is None:
+                        distances[neighbor] = level
+                        counts[neighbor] = count
+                        next_frontier.append(neighbor)
+                    elif distance == level:
+                        counts[neighbor] += count
+            frontier = next_frontier
+        return counts[target], distances
+
+    def all_shortest_paths(self, source, target):
+        """
+        Yields every shortest list of (movie, person) index pairs that
+        connect the source to the target, one at a time.
+
+        Paths are walked back from the target through the people one level
+        closer to the source, so memory stays proportional to the search
+        rather than to the number of paths.
+        """
+        count, distances = self.count_shortest_paths(source, target)
+        if count == 0:
+            return
+        if source == target:
+            yield []
+            return
+
+        def predecessors(person):
+            level = distances[person] - 1
+            for movie in self.movies_of(person):
+                for parent in self.stars_of(movie):
+                    if distances.get(parent) == level:
+                        yield movie, parent
+
+        stack = [predecessors(target)]
+        people = [target]
+        suffix = []
+        while stack:
+            step = next(stack[-1], None)
+            if step is None:
+                stack.pop()
+                people.pop()
+                if suffix:
+                    suffix.pop()
+                continue
+            movie, parent = step
+            suffix.append((movie, people[-1]))
+            if parent == source:
+                yield suffix[::-1]
+                suffix.pop()
+            else:
+                stack.append(predecessors(parent))
+                people.append(parent)
+
+    def expand_level(self, frontier, parents, via, expanded, others):
+        """
+        Expands every person in `frontier` by one step, skipping movies
+        this side of the search has already expanded.
+
+        Returns the next frontier and the first person also reached by the
+        other side of the search, if any.
+        """
+        movies_of, stars_of = self.movies_of, self.stars_of
+        next_frontier = []
+        for person in frontier:
+            for movie in movies_of(person):
+                if movie in expanded:
+                    continue
+                expanded.add(movie)
+                for neighbor in stars_of(movie):
+                    if neighbor in parents:
+                        continue
+                    parents[neighbor] = person
+                    via[neighbor] = movie
+                    if neighbor in others:
+                        return next_frontier, neighbor
+                    next_frontier.append(neighbor)
+        return next_frontier, None
+
+
+class PeopleView(Mapping):
+    """
+    Read-only mapping of person_ids to a dictionary of:
+    name, birth, movies (a set of movie_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        graph = self.graph
+        person = graph.person_index(person_id)
+        return {
+            "name": graph.person_names[person],
+            "birth": graph.person_births[person],
+            "movies": {graph.movie_ids[movie]
+                       for movie in graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only mapping of movie_ids to a dictionary of:
+    title, year, stars (a set of person_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        graph = self.graph
+        movie = graph.movie_index(movie_id)
+        return {
+            "title": graph.movie_titles[movie],
+            "year": graph.movie_years[movie],
+            "stars": {graph.person_ids[person]
+                      for person in graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only mapping of lowercase names to a set of corresponding person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        people = self.graph.people_named(name)
+        if len(people) == 0:
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in people}
+
+    def __contains__(self, name):
+        return len(self.graph.people_named(name)) > 0
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.lowercase_name(person)
+            if name != previous:
+                yield name
+                previous = name
+        for name, added in self.graph.added_names.items():
+            if len(self.graph.people_named(name)) == len(added):
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class Extended(Sequence):
+    """
+    Read-only sequence, such as a memory-mapped table, with values
+    appended after it.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.added = []
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < len(self.base):
+            return self.base[i]
+        return self.added[i - len(self.base)]
+
+    def __len__(self):
+        return len(self.base) + len(self.added)
+
+    def append(self, value):
+        self.added.append(value)
+
+
+def extendable(table):
+    """
+    Returns `table` if values can be appended to it, otherwise an
+    Extended sequence over it.
+    """
+    if isinstance(table, (list, Extended)):
+        return table
+    return Extended(table)
+
+
+def merge_rows(offsets, indices, added, rows):
+    """
+    Returns NumPy CSR offset and index arrays with `rows` rows, holding
+    the entries of `offsets` and `indices` followed by those in `added`,
+    a dictionary of row to a list of columns.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    indices = np.asarray(indices, dtype=np.int64)
+    if not added and len(offsets) == rows + 1:
+        return offsets, indices
+    loaded = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    added_rows = np.array(
+        [row for row, columns in added.items() for _ in columns],
+        dtype=np.int64
+    )
+    added_columns = np.array(
+        [column for columns in added.values() for column in columns],
+        dtype=np.int64
+    )
+    all_rows = np.concatenate([loaded, added_rows])
+    order = np.argsort(all_rows, kind="stable")
+    merged = np.zeros(rows + 1, dtype=np.int64)
+    merged[1:] = np.cumsum(np.bincount(all_rows, minlength=rows))
+    return merged, np.concatenate([indices, added_columns])[order]
+
+
+def histogram(distances):
+    """
+    Returns a dictionary mapping each degree of separation in a sweep to
+    the number of people at that distance, with -1 for not connected.
+    """
+    if np is not None and isinstance(distances, np.ndarray):
+        values, counts = np.unique(distances, return_counts=True)
+        return {int(value): int(count) for value, count in zip(values, counts)}
+    counts = {}
+    for distance in distances:
+        counts[int(distance)] = counts.get(int(distance), 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def gather(offsets, indices, rows):
+    """
+    Returns, for every entry of the CSR `rows`, the position of its row
+    in `rows` and its column index.
+    """
+    starts = offsets[rows]
+    counts = offsets[rows + 1] - starts
+    positions = np.repeat(np.arange(len(rows)), counts)
+    shifts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    return positions, indices[shifts + np.arange(counts.sum())]
+
+
+def compress(keys, rows, width):
+    """
+    Builds CSR offset and index arrays from sorted `row * width + column`
+    keys.
+    """
+    offsets = array(INDEX, [0]) * (rows + 1)
+    indices = array(INDEX)
+    for key in keys:
+        row, column = divmod(key, width)
+        offsets[row + 1] += 1
+        indices.append(column)
+    for row in range(rows):
+        offsets[row + 1] += offsets[row]
+    return offsets, indices
+
+
+def find(order, ids, key):
+    """
+    Binary searches `order`, indices sorted by their value in `ids`,
+    for the index whose id is `key`, raising KeyError if there is none.
+    """
+    i = bisect_left(order, key, key=ids.__getitem__)
+    if i == len(order) or ids[order[i]] != key:
+        raise KeyError(key)
+    return order[i]
@@ -0,0 +1,279 @@
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import defaultdict, deque
+from collections.abc import Sequence
+from operator import sub
+
+from snapshot import ALIGNMENT, fingerprint
+
+# Name of the landmark index file written next to the CSV files
+LANDMARKS = "degrees.landmarks"
+
+MAGIC = b"LANDMARK"
+VERSION = 1
+
+# Number of landmarks picked by default
+COUNT = 8
+
+
+class LandmarkIndex():
+    """
+    Degrees of separation from a handful of high-degree landmark people
+    to everyone else. By the triangle inequality, for every landmark L
+
+        |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+
+    which bounds the degrees of separation between any two people.
+    """
+
+    def __init__(self, landmarks, distances):
+        self.landmarks = landmarks
+        self.distances = distances
+
+    @classmethod
+    def build(cls, graph, count=COUNT):
+        """
+        Picks the `count` people who starred alongside the most others
+        (counting repeats) and records the distances from each of them.
+        """
+        def costars(person):
+            return sum(len(graph.stars_of(movie)) - 1
+                       for movie in graph.movies_of(person))
+        people = range(len(graph.person_ids))
+        landmarks = sorted(people, key=costars, reverse=True)[:count]
+        return cls(landmarks,
+                   [graph.distances(landmark) for landmark in landmarks])
+
+    @classmethod
+    def load_or_build(cls, graph, directory, count=COUNT):
+        """
+        Returns the landmark index saved in `directory`, building and
+        saving one if it is missing or out of date. A saved index is
+        brought up to date with any stars added to the graph since loading.
+        """
+        index = cls.load(directory)
+        if index is not None and len(index.landmarks) == count:
+            index.update(graph, graph.added_stars)
+            return index
+        index = cls.build(graph, count)
+        try:
+            index.save(directory)
+        except OSError:
+            pass
+        return index
+
+    def save(self, directory):
+        """
+        Writes the index to the landmark file in `directory`.
+        """
+        header = json.dumps({
+            "version": VERSION,
+            "byteorder": sys.byteorder,
+            "sources": fingerprint(directory),
+            "landmarks": list(self.landmarks)
+        }).encode("utf-8")
+        header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+        path = os.path.join(directory, LANDMARKS)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for distances in self.distances:
+                f.write(array("i", distances).tobytes())
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Memory-maps the landmark file in `directory`.
+
+        Returns None if there is no index, or if it is unreadable or
+        older than the CSV files.
+        """
+        path = os.path.join(directory, LANDMARKS)
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            start = len(MAGIC) + 8
+            if buffer[:len(MAGIC)] != MAGIC:
+                return None
+            (length,) = struct.unpack("<Q", buffer[len(MAGIC):start])
+            header = json.loads(buffer[start:start + length])
+            if (header["version"] != VERSION
+                    or header["byteorder"] != sys.byteorder
+                    or header["sources"] != fingerprint(directory)):
+                return None
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+
+        landmarks = header["landmarks"]
+        view = memoryview(buffer)[start + length:].cast("i")
+        people = len(view) // max(len(landmarks), 1)
+        distances = [view[i * people:(i + 1) * people]
+                     for i in range(len(landmarks))]
+        index = cls(landmarks, distances)
+        index.buffer = buffer
+        return index
+
+    def update(self, graph, movies):
+        """
+        Lowers the landmark distances after stars were added to `movies`.
+
+        New stars only shorten paths, and only through those movies, so
+        each movie's stars are relaxed from its closest star and the change
+        is propagated breadth-first to the people whose distance drops.
+        """
+        for i, distances in enumerate(self.distances):
+            if not isinstance(distances, Patched):
+                distances = self.distances[i] = Patched(distances)
+            distances.length = len(graph.person_ids)
+
+            queue = deque()
+            for movie in movies:
+                stars = graph.stars_of(movie)
+                reached = [distances[star] for star in stars
+                           if distances[star] >= 0]
+                if not reached:
+                    continue
+                level = min(reached) + 1
+                for star in stars:
+                    if distances[star] < 0 or distances[star] > level:
+                        distances[star] = level
+                        queue.append(star)
+
+            while queue:
+                person = queue.popleft()
+                level = distances[person] + 1
+                for movie in graph.movies_of(person):
+                    for neighbor in graph.stars_of(movie):
+                        if distances[neighbor] < 0 or distances[neighbor] > level:
+                            distances[neighbor] = level
+                            queue.append(neighbor)
+
+    def bounds(self, source, target):
+        """
+        Returns (lower, upper) bounds on the degrees of separation between
+        two people. Both are math.inf if the landmarks prove they are not
+        connected, and upper is math.inf if no landmark reaches them.
+        """
+        if source == target:
+            return 0, 0
+        lower, upper = 0, math.inf
+        for distances in self.distances:
+            s, t = distances[source], distances[target]
+            if s < 0 and t < 0:
+                continue
+            if s < 0 or t < 0:
+                return math.inf, math.inf
+            lower = max(lower, abs(s - t))
+            upper = min(upper, s + t)
+        return lower, upper
+
+    def shortest_path(self, graph, source, target):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, using A* search with the landmark
+        lower bound as heuristic (ALT) and discarding any person whose
+        estimated path would exceed the landmark upper bound.
+
+        If no possible path, returns None.
+        """
+        lower, upper = self.bounds(source, target)
+        if lower == math.inf or not graph.connected(source, target):
+            return None
+        if source == target:
+            return []
+
+        # Landmarks that reach the target also reach everyone connected to
+        # it, so the heuristic only looks at those
+        columns = [distances for distances in self.distances
+                   if distances[target] >= 0]
+        goals = [distances[target] for distances in columns]
+        if not columns:
+            columns, goals = [()], [0]
+
+        def heuristic(person):
+            return max(map(abs, map(
+                sub, [distances[person] for distances in columns], goals
+            ))) if columns[0] else 0
+
+        # Best known cost, parent person and connecting movie of each
+        # reached person, and the lowest cost each movie was expanded at
+        cost, parents, via = {source: 0}, {source: -1}, {source: -1}
+        expanded_at = {}
+        closed = set()
+
+        # People waiting to be expanded, bucketed by estimated path length
+        buckets = defaultdict(list)
+        estimate = heuristic(source)
+        buckets[estimate].append(source)
+
+        while buckets and estimate <= upper:
+            bucket = buckets.pop(estimate, [])
+            while bucket:
+                person = bucket.pop()
+                if person in closed:
+                    continue
+                closed.add(person)
+                if person == target:
+                    path = []
+                    while parents[person] != -1:
+                        path.append((via[person], person))
+                        person = parents[person]
+                    path.reverse()
+                    return path
+
+                next_cost = cost[person] + 1
+                for movie in graph.movies_of(person):
+                    if expanded_at.get(movie, math.inf) < next_cost:
+                        continue
+                    expanded_at[movie] = next_cost - 1
+                    for neighbor in graph.stars_of(movie):
+                        if next_cost >= cost.get(neighbor, math.inf):
+                            continue
+                        neighbor_estimate = next_cost + heuristic(neighbor)
+                        if neighbor_estimate > upper:
+                            continue
+                        cost[neighbor] = next_cost
+                        parents[neighbor] = person
+                        via[neighbor] = movie
+                        if neighbor_estimate == estimate:
+                            bucket.append(neighbor)
+                        else:
+                            buckets[neighbor_estimate].append(neighbor)
+            estimate += 1
+        return None
+
+
+class Patched(Sequence):
+    """
+    Distances read from a loaded array, with the entries changed since
+    kept in a dictionary. People beyond the array are not connected
+    unless changed.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.changes = {}
+        self.length = len(base)
+
+    def __getitem__(self, person):
+        if person in self.changes:
+            return self.changes[person]
+        if not 0 <= person < self.length:
+            raise IndexError("distance index out of range")
+        if person < len(self.base):
+            return self.base[person]
+        return -1
+
+    def __setitem__(self, person, distance):
+        self.changes[person] = distance
+
+    def __len__(self):
+        return self.length
@@ -0,0 +1,108 @@
+from bisect import bisect_left
+
+# Sorts after every character, so `prefix + LAST` bounds all names
+# starting with `prefix`
+LAST = "\U0010ffff"
+
+
+class NameIndex():
+    """
+    Prefix and typo-tolerant lookup of people by name.
+
+    The people of a graph sorted by lowercase name form an implicit trie:
+    every trie node is the contiguous run of names sharing its prefix, and
+    binary search jumps from one node to the next. No extra structure is
+    stored, so the index works directly on a memory-mapped snapshot.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to `limit` people whose name starts with `prefix`,
+        in name order.
+        """
+        prefix = prefix.lower()
+        order, key = self.graph.name_order, self.graph.lowercase_name
+        start = bisect_left(order, prefix, key=key)
+        end = bisect_left(order, prefix + LAST, start, key=key)
+        people = list(order[start:min(end, start + limit)])
+
+        # People added since loading are not in the sorted order
+        for name, added in self.graph.added_names.items():
+            if name.startswith(prefix):
+                people.extend(added)
+        people.sort(key=key)
+        return people[:limit]
+
+    def fuzzy(self, name, max_distance=2, limit=10):
+        """
+        Returns up to `limit` (distance, person) pairs for the people whose
+        name is within `max_distance` edits of `name`, closest first.
+
+        Walks the implicit trie keeping one row of the Levenshtein table per
+        prefix character, reusing the rows of the prefix each name shares
+        with the previous one and skipping every name under a prefix that
+        is already more than `max_distance` edits away.
+        """
+        query = name.lower()
+        order, key = self.graph.name_order, self.graph.lowercase_name
+        rows = [list(range(len(query) + 1))]
+        previous = ""
+        matches = []
+
+        i = 0
+        while i < len(order):
+            word = key(order[i])
+            common = 0
+            limit_common = min(len(previous), len(word), len(rows) - 1)
+            while common < limit_common and previous[common] == word[common]:
+                common += 1
+            del rows[common + 1:]
+
+            dead_end = None
+            for depth in range(common, len(word)):
+                above = rows[-1]
+                row = [above[0] + 1]
+                for j in range(1, len(query) + 1):
+                    row.append(min(
+                        row[j - 1] + 1,
+                        above[j] + 1,
+                        above[j - 1] + (query[j - 1] != word[depth])
+                    ))
+                rows.append(row)
+                if min(row) > max_distance:
+                    dead_end = depth + 1
+                    break
+
+            if dead_end is None:
+                if rows[-1][-1] <= max_distance:
+                    matches.append((rows[-1][-1], order[i]))
+                previous = word
+                i += 1
+            else:
+                previous = word[:dead_end]
+                i = bisect_left(order, previous + LAST, i, key=key)
+
+        # People added since loading are not in the sorted order
+        for word, added in self.graph.added_names.items():
+            distance = levenshtein(query, word)
+            if distance <= max_distance:
+                matches.extend((distance, person) for person in added)
+
+        matches.sort(key=lambda match: match[0])
+        return matches[:limit]
+
+
+def levenshtein(a, b):
+    """
+    Returns the number of single-character edits turning `a` into `b`.
+    """
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        above, row = row, [i]
+        for j, y in enumerate(b, 1):
+            row.append(min(row[j - 1] + 1, above[j] + 1,
+                           above[j - 1] + (x != y)))
+    return row[-1]
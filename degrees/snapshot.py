@@ -0,0 +1,230 @@
+import csv
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from graph import INDEX, Graph
+
+# Name of the snapshot file written next to the CSV files
+SNAPSHOT = "degrees.snapshot"
+
+# Name of the file recording updates made on top of the CSV files
+JOURNAL = "degrees.journal"
+
+MAGIC = b"DEGREES\0"
+VERSION = 2
+
+# CSV files whose size and modification time the snapshot depends on
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+# Graph attributes stored as tables of strings and as index arrays
+STRINGS = ("person_ids", "person_names", "person_births",
+           "movie_ids", "movie_titles", "movie_years")
+INDICES = ("person_offsets", "person_movies", "movie_offsets", "movie_stars",
+           "person_order", "movie_order", "name_order",
+           "component_labels", "component_sizes")
+
+ALIGNMENT = 8
+
+
+class StringTable(Sequence):
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus an
+    array of byte offsets, decoding each string only when accessed.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.blob[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def load_graph(directory):
+    """
+    Returns the graph for `directory`, memory-mapping its snapshot if it
+    is up to date and otherwise parsing the CSV files and writing a new
+    snapshot for the next run. Updates recorded in the journal are then
+    applied on top.
+    """
+    graph = load(directory)
+    if graph is None:
+        graph = Graph.from_csv(directory)
+        try:
+            save(graph, directory)
+        except OSError:
+            pass
+    graph.apply(read_journal(directory))
+    return graph
+
+
+def read_delta(directory):
+    """
+    Yields update records from whichever of people.csv, movies.csv and
+    stars.csv exist in `directory`, in the same format as the dataset.
+    """
+    files = [
+        ("people.csv", lambda row: ("person", row["id"], row["name"],
+                                    row["birth"])),
+        ("movies.csv", lambda row: ("movie", row["id"], row["title"],
+                                    row["year"])),
+        ("stars.csv", lambda row: ("star", row["person_id"],
+                                   row["movie_id"]))
+    ]
+    for name, record in files:
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield record(row)
+
+
+def read_journal(directory):
+    """
+    Returns the update records journaled in `directory`, or none if the
+    journal was written against different CSV files.
+    """
+    path = os.path.join(directory, JOURNAL)
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("sources") != fingerprint(directory):
+                return []
+            return [tuple(json.loads(line)) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+def append_journal(directory, records):
+    """
+    Appends update records to the journal in `directory`, starting a new
+    journal if the existing one was written against different CSV files.
+    """
+    path = os.path.join(directory, JOURNAL)
+    sources = fingerprint(directory)
+    try:
+        with open(path, encoding="utf-8") as f:
+            fresh = json.loads(f.readline()).get("sources") != sources
+    except (OSError, ValueError):
+        fresh = True
+    with open(path, "w" if fresh else "a", encoding="utf-8") as f:
+        if fresh:
+            f.write(json.dumps({"sources": sources}) + "\n")
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of each source CSV file.
+    """
+    sources = {}
+    for name in SOURCES:
+        stat = os.stat(os.path.join(directory, name))
+        sources[name] = [stat.st_size, stat.st_mtime_ns]
+    return sources
+
+
+def save(graph, directory):
+    """
+    Writes `graph` to the snapshot file in `directory`.
+    """
+    sections = {}
+    chunks = []
+    size = 0
+
+    def append(name, data):
+        nonlocal size
+        data = bytes(data)
+        padding = -len(data) % ALIGNMENT
+        sections[name] = [size, len(data)]
+        chunks.append(data + bytes(padding))
+        size += len(data) + padding
+
+    for name in STRINGS:
+        encoded = [value.encode("utf-8") for value in getattr(graph, name)]
+        offsets = array(INDEX, [0])
+        for value in encoded:
+            offsets.append(offsets[-1] + len(value))
+        append(f"{name}.offsets", offsets.tobytes())
+        append(f"{name}.blob", b"".join(encoded))
+    for name in INDICES:
+        append(name, array(INDEX, getattr(graph, name)).tobytes())
+
+    header = json.dumps({
+        "version": VERSION,
+        "byteorder": sys.byteorder,
+        "sources": fingerprint(directory),
+        "sections": sections
+    }).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGNMENT)
+
+    path = os.path.join(directory, SNAPSHOT)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(f"{path}.tmp", path)
+
+
+def load(directory):
+    """
+    Memory-maps the snapshot file in `directory` into a graph.
+
+    Returns None if there is no snapshot, or if it is unreadable or
+    older than the CSV files.
+    """
+    path = os.path.join(directory, SNAPSHOT)
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if buffer[:len(MAGIC)] != MAGIC:
+            return None
+        start = len(MAGIC) + 8
+        (length,) = struct.unpack("<Q", buffer[len(MAGIC):start])
+        header = json.loads(buffer[start:start + length])
+        if (header["version"] != VERSION
+                or header["byteorder"] != sys.byteorder
+                or header["sources"] != fingerprint(directory)):
+            return None
+    except (OSError, ValueError, KeyError, struct.error):
+        return None
+
+    view = memoryview(buffer)
+    data = start + length
+
+    def section(name):
+        offset, size = header["sections"][name]
+        return view[data + offset:data + offset + size]
+
+    fields = {}
+    for name in STRINGS:
+        fields[name] = StringTable(
+            section(f"{name}.blob"), section(f"{name}.offsets").cast(INDEX)
+        )
+    for name in INDICES:
+        fields[name] = section(name).cast(INDEX)
+    graph = Graph(**fields)
+    graph.buffer = buffer
+    return graph
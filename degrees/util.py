@@ -1,4 +1,9 @@
+from collections import deque
+
+
 class Node():
+    __slots__ = ("state", "parent", "action")
+
     def __init__(self, state, parent, action):
         self.state = state
         self.parent = parent
@@ -7,7 +12,7 @@ class Node():
 
 class QueueFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
 
     def add(self, node):
         self.frontier.append(node)
@@ -19,6 +24,4 @@ class QueueFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
-            return node
\ No newline at end of file
+            return self.frontier.popleft()
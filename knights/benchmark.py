@@ -0,0 +1,133 @@
+"""
+Measures the time taken to check entailment of each symbol by the
+knowledge bases of puzzle.py, and by a synthetic knowledge base over
+more symbols, with the original recursive model check that copies a
+dict per model and walks the sentence objects, against enumeration of
+compiled sentences, bitwise truth tables, pruned enumeration of
+partial models and the SAT solver, and against a knowledge base object
+answering all of the queries together.
+
+Usage: python benchmark.py [--symbols N] [--repeat N]
+"""
+
+import argparse
+import time
+
+import puzzle
+from logic import And, Implication, KnowledgeBase, Symbol, model_check
+
+
+def original_check(knowledge, query):
+    """Checks if knowledge base entails query."""
+
+    def check_all(knowledge, query, symbols, model):
+        """Checks if knowledge base entails query, given a particular model."""
+
+        # If model has an assignment for each symbol
+        if not symbols:
+
+            # If knowledge base is true in model, then query must also be true
+            if knowledge.evaluate(model):
+                return query.evaluate(model)
+            return True
+        else:
+
+            # Choose one of the remaining unused symbols
+            remaining = symbols.copy()
+            p = remaining.pop()
+
+            # Create a model where the symbol is true
+            model_true = model.copy()
+            model_true[p] = True
+
+            # Create a model where the symbol is false
+            model_false = model.copy()
+            model_false[p] = False
+
+            # Ensure entailment holds in both models
+            return (check_all(knowledge, query, remaining, model_true) and
+                    check_all(knowledge, query, remaining, model_false))
+
+    # Get all symbols in both knowledge and query
+    symbols = set.union(knowledge.symbols(), query.symbols())
+
+    # Check that knowledge entails query
+    return check_all(knowledge, query, symbols, dict())
+
+
+def each(check, **options):
+    """Returns a function checking each query in turn with `check`."""
+    return lambda knowledge, queries: [check(knowledge, query, **options)
+                                       for query in queries]
+
+
+METHODS = [
+    ("original", each(original_check)),
+    ("compiled", each(model_check, method="enumerate")),
+    ("table", each(model_check, method="table")),
+    ("prune", each(model_check, method="prune")),
+    ("sat", each(model_check, method="sat")),
+    ("knowledge base", lambda knowledge, queries: (
+        KnowledgeBase(knowledge).ask_all(queries)
+    ))
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--symbols N] [--repeat N]"
+    )
+    parser.add_argument("--symbols", type=int, default=14,
+                        help="symbols in the synthetic knowledge base")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="time each check N times, keeping the fastest")
+    args = parser.parse_args()
+
+    symbols = [puzzle.AKnight, puzzle.AKnave, puzzle.BKnight,
+               puzzle.BKnave, puzzle.CKnight, puzzle.CKnave]
+    chain, queries = synthetic_knowledge(args.symbols)
+    workloads = [
+        ("puzzle 0", puzzle.knowledge0, symbols),
+        ("puzzle 1", puzzle.knowledge1, symbols),
+        ("puzzle 2", puzzle.knowledge2, symbols),
+        ("puzzle 3", puzzle.knowledge3, symbols),
+        (f"chain of {args.symbols} symbols", chain, queries)
+    ]
+    for name, knowledge, queries in workloads:
+        print(name)
+        baseline = None
+        for label, check in METHODS:
+            answers, seconds = measure(check, knowledge, queries, args.repeat)
+            baseline = baseline or seconds
+            print(f"    {label}: {seconds * 1000:.2f}ms, "
+                  f"{baseline / seconds:.1f}x, "
+                  f"{sum(answers)} of {len(answers)} entailed")
+
+
+def synthetic_knowledge(n):
+    """
+    Returns a knowledge base asserting the first of `n` symbols and that
+    each symbol implies the next, and the first and last symbols as
+    queries, which it entails only after every model is checked.
+    """
+    symbols = [Symbol(f"P{i}") for i in range(n)]
+    knowledge = And(symbols[0], *[Implication(symbols[i], symbols[i + 1])
+                                  for i in range(n - 1)])
+    return knowledge, [symbols[0], symbols[-1]]
+
+
+def measure(check, knowledge, queries, repeat):
+    """
+    Checks every query against the knowledge base `repeat` times,
+    returning the answers and the fastest time taken.
+    """
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        answers = check(knowledge, queries)
+        seconds = min(seconds, time.perf_counter() - start)
+    return answers, seconds
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,138 @@
+import functools
 import itertools
+import multiprocessing
+import os
+import weakref
+from collections import Counter
+
+from sat import Solver
+
+# Depth of nested operators in compiled code before a subexpression is
+# computed into a variable, to stay within the parser's nesting limit
+NESTING = 50
+
+# Compiled functions kept for sentences compiled again
+COMPILED = 1024
+
+# Models whose truth tables are computed together, as a power of two, so
+# that each table is an integer of at most 2 ** 20 bits (128 KiB)
+CHUNK = 20
+
+# Shards per worker process when checking entailment in parallel, so that
+# a worker finishing early can take another shard
+SHARDS = 4
+
+# Every sentence in use, by class and operands, so that structurally
+# equal sentences are built only once
+interned = weakref.WeakValueDictionary()
 
 
 class Sentence():
+    """
+    Immutable logical sentence. Sentences are interned: building one equal
+    to a sentence already in use returns that sentence, so equal sentences
+    are the same object and share their subterms, and each computes its
+    hash and its set of symbols once.
+    """
+    __slots__ = ("hash", "names", "__weakref__")
+
+    @classmethod
+    def intern(cls, values, names):
+        """
+        Returns the sentence of this class whose slots hold `values` and
+        whose symbols are `names`, creating it if there is none yet.
+        """
+        key = (cls, *values)
+        sentence = interned.get(key)
+        if sentence is None:
+            sentence = object.__new__(cls)
+            for slot, value in zip(cls.__slots__, values):
+                object.__setattr__(sentence, slot, value)
+            object.__setattr__(sentence, "hash", hash(key))
+            object.__setattr__(sentence, "names", names)
+            interned[key] = sentence
+        return sentence
+
+    def __setattr__(self, name, value):
+        raise AttributeError("sentences are immutable")
+
+    def __hash__(self):
+        return self.hash
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, slot)
+                                 for slot in self.__slots__)
 
     def evaluate(self, model):
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def partial(self, model):
+        """
+        Evaluates the logical sentence in a model that may leave symbols
+        unassigned, returning None if its value depends on them.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
 
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        return set(self.names)
+
+    def occurrences(self):
+        """Returns how many times each symbol occurs in the sentence."""
+        raise Exception("nothing to count")
+
+    def literal(self, solver):
+        """Returns a solver literal equivalent to the logical sentence."""
+        raise Exception("nothing to encode")
+
+    def table(self, columns, full):
+        """
+        Evaluates the logical sentence in many models at once, given the
+        values of each symbol in `columns` as the bits of an integer, one
+        per model, and an integer `full` with every model's bit set.
+        """
+        raise Exception("nothing to evaluate")
+
+    def source(self):
+        """Returns a Python expression template for the sentence, with a
+        {} for each of the operands returned alongside it."""
+        raise Exception("nothing to compile")
+
+    def compile(self, symbols=None, bitmask=False):
+        """
+        Returns a function evaluating the logical sentence in a single
+        flat expression over a tuple of truth values, one per symbol in
+        `symbols` (all symbols, sorted, by default), or over an integer
+        whose bit i is the value of symbol i if `bitmask` is True.
+        """
+        if symbols is None:
+            symbols = sorted(self.names)
+        index = {symbol: i for i, symbol in enumerate(symbols)}
+        lines = []
+        depth = 0
+
+        def code(sentence):
+            nonlocal depth
+            if isinstance(sentence, Symbol):
+                i = index[sentence.name]
+                return f"(v >> {i} & 1)" if bitmask else f"v[{i}]"
+            template, operands = sentence.source()
+            depth += 1
+            expression = template.format(*map(code, operands))
+            depth -= 1
+            if depth % NESTING != NESTING - 1:
+                return expression
+            lines.append(f"    t{len(lines)} = {expression}")
+            return f"t{len(lines) - 1}"
+
+        result = code(self)
+        return build("\n".join(["def evaluate(v):", *lines,
+                                f"    return {result}"]))
 
     @classmethod
     def validate(cls, sentence):
@@ -43,15 +162,10 @@ class Sentence():
 
 
 class Symbol(Sentence):
+    __slots__ = ("name",)
 
-    def __init__(self, name):
-        self.name = name
-
-    def __eq__(self, other):
-        return isinstance(other, Symbol) and self.name == other.name
-
-    def __hash__(self):
-        return hash(("symbol", self.name))
+    def __new__(cls, name):
+        return cls.intern((name,), frozenset([name]))
 
     def __repr__(self):
         return self.name
@@ -62,23 +176,31 @@ class Symbol(Sentence):
         except KeyError:
             raise Exception(f"variable {self.name} not in model")
 
+    def partial(self, model):
+        return model.get(self.name)
+
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
+    def occurrences(self):
+        return Counter([self.name])
 
+    def literal(self, solver):
+        return solver.variable(self.name)
 
-class Not(Sentence):
-    def __init__(self, operand):
-        Sentence.validate(operand)
-        self.operand = operand
+    def table(self, columns, full):
+        try:
+            return columns[self.name]
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
 
-    def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
 
-    def __hash__(self):
-        return hash(("not", hash(self.operand)))
+class Not(Sentence):
+    __slots__ = ("operand",)
+
+    def __new__(cls, operand):
+        Sentence.validate(operand)
+        return cls.intern((operand,), operand.names)
 
     def __repr__(self):
         return f"Not({self.operand})"
@@ -86,26 +208,39 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def partial(self, model):
+        value = self.operand.partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def occurrences(self):
+        return self.operand.occurrences()
+
+
+    def literal(self, solver):
+        return -self.operand.literal(solver)
+
+    def table(self, columns, full):
+        return self.operand.table(columns, full) ^ full
+
+    def source(self):
+        return "(not {})", [self.operand]
 
 
 class And(Sentence):
-    def __init__(self, *conjuncts):
+    __slots__ = ("conjuncts",)
+
+    def __new__(cls, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
-        self.conjuncts = list(conjuncts)
+        names = frozenset().union(*[conjunct.names
+                                    for conjunct in conjuncts])
+        return cls.intern((conjuncts,), names)
 
-    def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
-
-    def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+    def __reduce__(self):
+        return And, self.conjuncts
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,35 +249,65 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
-        Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
+        """Returns the conjunction with `conjunct` added at the end."""
+        return And(*self.conjuncts, conjunct)
 
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def partial(self, model):
+        value = True
+        for conjunct in self.conjuncts:
+            known = conjunct.partial(model)
+            if known is False:
+                return False
+            if known is None:
+                value = None
+        return value
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def occurrences(self):
+        return sum([conjunct.occurrences() for conjunct in self.conjuncts],
+                   Counter())
+
+
+    def literal(self, solver):
+        return solver.conjunction(
+            [conjunct.literal(solver) for conjunct in self.conjuncts]
+        )
+
+    def table(self, columns, full):
+        bits = full
+        for conjunct in self.conjuncts:
+            bits &= conjunct.table(columns, full)
+            if not bits:
+                break
+        return bits
+
+    def source(self):
+        if not self.conjuncts:
+            return "True", []
+        template = " and ".join(["{}"] * len(self.conjuncts))
+        return f"({template})", self.conjuncts
 
 
 class Or(Sentence):
-    def __init__(self, *disjuncts):
+    __slots__ = ("disjuncts",)
+
+    def __new__(cls, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        names = frozenset().union(*[disjunct.names
+                                    for disjunct in disjuncts])
+        return cls.intern((disjuncts,), names)
 
-    def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
-
-    def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+    def __reduce__(self):
+        return Or, self.disjuncts
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
@@ -151,30 +316,55 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def partial(self, model):
+        value = False
+        for disjunct in self.disjuncts:
+            known = disjunct.partial(model)
+            if known is True:
+                return True
+            if known is None:
+                value = None
+        return value
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def occurrences(self):
+        return sum([disjunct.occurrences() for disjunct in self.disjuncts],
+                   Counter())
+
+
+    def literal(self, solver):
+        return solver.disjunction(
+            [disjunct.literal(solver) for disjunct in self.disjuncts]
+        )
+
+    def table(self, columns, full):
+        bits = 0
+        for disjunct in self.disjuncts:
+            bits |= disjunct.table(columns, full)
+            if bits == full:
+                break
+        return bits
+
+    def source(self):
+        if not self.disjuncts:
+            return "False", []
+        template = " or ".join(["{}"] * len(self.disjuncts))
+        return f"({template})", self.disjuncts
 
 
 class Implication(Sentence):
-    def __init__(self, antecedent, consequent):
+    __slots__ = ("antecedent", "consequent")
+
+    def __new__(cls, antecedent, consequent):
         Sentence.validate(antecedent)
         Sentence.validate(consequent)
-        self.antecedent = antecedent
-        self.consequent = consequent
-
-    def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
-
-    def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        return cls.intern((antecedent, consequent),
+                          antecedent.names | consequent.names)
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
@@ -183,29 +373,47 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def partial(self, model):
+        antecedent = self.antecedent.partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.partial(model)
+        if consequent is True:
+            return True
+        if antecedent is None or consequent is None:
+            return None
+        return False
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def occurrences(self):
+        return self.antecedent.occurrences() + self.consequent.occurrences()
+
+
+    def literal(self, solver):
+        return solver.disjunction([-self.antecedent.literal(solver),
+                                   self.consequent.literal(solver)])
+
+    def table(self, columns, full):
+        antecedent = self.antecedent.table(columns, full)
+        if not antecedent:
+            return full
+        return (antecedent ^ full) | self.consequent.table(columns, full)
+
+    def source(self):
+        return "(not {} or {})", [self.antecedent, self.consequent]
 
 
 class Biconditional(Sentence):
-    def __init__(self, left, right):
+    __slots__ = ("left", "right")
+
+    def __new__(cls, left, right):
         Sentence.validate(left)
         Sentence.validate(right)
-        self.left = left
-        self.right = right
-
-    def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
-
-    def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        return cls.intern((left, right), left.names | right.names)
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
@@ -216,48 +424,257 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def partial(self, model):
+        left = self.left.partial(model)
+        if left is None:
+            return None
+        right = self.right.partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
-
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    def occurrences(self):
+        return self.left.occurrences() + self.right.occurrences()
+
+
+    def literal(self, solver):
+        return solver.equivalence(self.left.literal(solver),
+                                  self.right.literal(solver))
+
+    def table(self, columns, full):
+        return (self.left.table(columns, full)
+                ^ self.right.table(columns, full) ^ full)
+
+    def source(self):
+        return "((not {}) == (not {}))", [self.left, self.right]
+
+
+@functools.lru_cache(maxsize=COMPILED)
+def build(source):
+    """Returns the evaluate function defined by compiled source code."""
+    namespace = {}
+    exec(source, namespace)
+    return namespace["evaluate"]
+
+
+class KnowledgeBase():
+    """
+    Knowledge base answering queries incrementally. Sentences told are
+    encoded once into a SAT solver, which keeps its clauses, and those it
+    learns from conflicts, between queries. Every model of the knowledge
+    base found along the way is kept too, since a query false in one of
+    them cannot be entailed.
+    """
+
+    def __init__(self, *sentences):
+        self.solver = Solver()
+        self.sentences = []
+        self.models = []
+        self.entailed = set()
+        for sentence in sentences:
+            self.tell(sentence)
+
+    def tell(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        self.sentences.append(sentence)
+        self.solver.add_clause([sentence.literal(self.solver)])
+
+        # Models found so far remain models only if the sentence is true
+        # in them; queries entailed remain entailed
+        self.models = [model for model in self.models
+                       if sentence.partial(model) is True]
+
+    def ask(self, query):
+        """Checks if the knowledge base entails query."""
+        return self.ask_all([query])[0]
+
+    def ask_all(self, queries):
+        """
+        Checks if the knowledge base entails each query. The queries not
+        ruled out by a model found so far are checked together, by looking
+        for a model where any of them is false, and each model found rules
+        out at least one more, so that when the queries are mostly
+        entailed, answering all of them takes a single solve.
+        """
+        for query in queries:
+            Sentence.validate(query)
+        pending = [query for query in queries
+                   if query not in self.entailed
+                   and not any(query.partial(model) is False
+                               for model in self.models)]
+        literals = {query: query.literal(self.solver) for query in pending}
+
+        while pending:
+            together = self.solver.conjunction(
+                [literals[query] for query in pending]
+            )
+            if not self.solver.solve([-together]):
+                self.entailed.update(pending)
+                break
+            model = self.solver.model
+            self.models.append({
+                name: model[variable]
+                for name, variable in self.solver.names.items()
+            })
+            pending = [query for query in pending
+                       if model[abs(literals[query])] == (literals[query] > 0)]
+
+        return [query in self.entailed for query in queries]
+
+
+def model_check(knowledge, query, method="sat"):
+    """
+    Checks if knowledge base entails query, either by showing with the SAT
+    solver that knowledge and not query cannot both be true ("sat"), by
+    enumerating every model ("enumerate"), by computing truth tables over
+    every model ("table"), or by assigning one symbol at a time and
+    skipping the models extending any partial model that already decides
+    the check ("prune"), or by computing truth tables in several processes
+    ("parallel").
+    """
+    if method == "sat":
+        return sat_check(knowledge, query)
+    if method == "parallel":
+        return parallel_check(knowledge, query)
+    if method == "prune":
+        return prune_check(knowledge, query)
+    if method == "table":
+        return table_check(knowledge, query)
+    if method != "enumerate":
+        raise Exception(f"unknown method {method}")
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
-
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    symbols = sorted(knowledge.names | query.names)
+
+    # Check that query is true in every model where knowledge is true,
+    # numbering models by the bits of the symbols that are true
+    knowledge = knowledge.compile(symbols, bitmask=True)
+    query = query.compile(symbols, bitmask=True)
+    return all(query(model) for model in range(1 << len(symbols))
+               if knowledge(model))
+
+
+def sat_check(knowledge, query):
+    """Checks if knowledge base entails query with the SAT solver."""
+    solver = Solver()
+    solver.add_clause([knowledge.literal(solver)])
+    return not solver.solve([-query.literal(solver)])
+
+
+def table_check(knowledge, query, chunk=CHUNK, model=None):
+    """
+    Checks if knowledge base entails query by computing their truth tables
+    for 2 ** `chunk` models at a time, each packed into the bits of an
+    integer so that every operator is applied to all models in one go.
+    Only the models extending the partial `model`, if given, are checked.
+    """
+    model = model or {}
+    symbols = sorted((knowledge.names | query.names) - model.keys())
+    size = min(len(symbols), chunk)
+    full = (1 << (1 << size)) - 1
+
+    # Symbol i is true in every model whose index has bit i set; within a
+    # chunk, the first symbols vary and the others are constant
+    varying = {}
+    for i, symbol in enumerate(symbols[:size]):
+        bits = ((1 << (1 << i)) - 1) << (1 << i)
+        width = 2 << i
+        while width < 1 << size:
+            bits |= bits << width
+            width *= 2
+        varying[symbol] = bits
+
+    for symbol, value in model.items():
+        varying[symbol] = full if value else 0
+
+    for index in range(1 << (len(symbols) - size)):
+        columns = dict(varying)
+        for i, symbol in enumerate(symbols[size:]):
+            columns[symbol] = full if index >> i & 1 else 0
+        counterexamples = knowledge.table(columns, full)
+        if counterexamples and counterexamples & ~query.table(columns, full):
+            return False
+    return True
+
+
+def prune_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by assigning symbols one at a
+    time, most frequent first, and stopping as soon as the knowledge base
+    is false or the query is true in the partial model.
+    """
+    occurrences = knowledge.occurrences() + query.occurrences()
+    symbols = sorted(occurrences, key=lambda name: (-occurrences[name], name))
+    model = {}
+
+    def check_all(assigned):
+        """Checks if knowledge base entails query, given a partial model."""
+        if knowledge.partial(model) is False or query.partial(model) is True:
+            return True
+        if assigned == len(symbols):
+            return False
+        symbol = symbols[assigned]
+        for value in (True, False):
+            model[symbol] = value
+            if not check_all(assigned + 1):
+                return False
+        del model[symbol]
+        return True
+
+    return check_all(0)
+
+
+def parallel_check(knowledge, query, workers=None, split=None):
+    """
+    Checks if knowledge base entails query by fixing the first `split`
+    symbols to each of their assignments and checking the truth tables of
+    each such shard in a pool of `workers` processes, by default one per
+    CPU, stopping them all as soon as one shard has a counter-model.
+    """
+    workers = workers or os.cpu_count() or 1
+    symbols = sorted(knowledge.names | query.names)
+    if split is None:
+        split = (SHARDS * workers - 1).bit_length()
+    split = min(split, len(symbols))
+    if workers == 1 or split == 0:
+        return table_check(knowledge, query)
+
+    # Each worker receives the sentences once, when it starts, and then
+    # only the number of the shard to check
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "fork" if "fork" in methods else None
+    )
+    with context.Pool(workers, initializer=start_shards,
+                      initargs=(knowledge, query, symbols[:split])) as pool:
+        for entailed in pool.imap_unordered(check_shard, range(1 << split)):
+            if not entailed:
+                return False
+    return True
+
+
+# Knowledge base, query and split symbols of the shards checked by a
+# worker process
+shards = None
+
+
+def start_shards(knowledge, query, symbols):
+    """Sets up a worker process to check shards of one entailment."""
+    global shards
+    shards = knowledge, query, symbols
+
+
+def check_shard(shard):
+    """
+    Checks entailment in the models where the split symbols take the
+    values of the bits of `shard`.
+    """
+    knowledge, query, symbols = shards
+    model = {symbol: bool(shard >> i & 1) for i, symbol in enumerate(symbols)}
+    return table_check(knowledge, query, model=model)
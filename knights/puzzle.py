@@ -68,8 +68,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            answers = KnowledgeBase(knowledge).ask_all(symbols)
+            for symbol, entailed in zip(symbols, answers):
+                if entailed:
                     print(f"    {symbol}")
 
 
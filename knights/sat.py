@@ -0,0 +1,393 @@
+"""
+Conflict-driven clause learning (CDCL) SAT solver.
+
+Clauses are lists of integer literals, as in the DIMACS format: variable
+v appears as v when true and as -v when false. Sentences are turned into
+clauses with the Tseitin encoding, one variable per distinct subformula.
+"""
+
+import heapq
+
+# Conflicts before the first restart, and growth of the interval
+RESTART = 100
+RESTART_GROWTH = 1.5
+
+# Growth of the activity bump, so that recent conflicts weigh more
+DECAY = 1 / 0.95
+
+# Activity above which all activities are scaled down
+RESCALE = 1e100
+
+
+class Solver():
+    """
+    Incremental SAT solver. Clauses can be added between calls to solve(),
+    which may assume some literals true for that call only, and clauses
+    learned from conflicts are kept for later calls.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.learned = []
+        self.unsatisfiable = False
+        self.model = None
+
+        # Value, decision level and implying clause of each variable,
+        # indexed from 1, plus the variable's activity and saved phase
+        self.values = [None]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.bump = 1.0
+        self.heap = []
+
+        # Clauses watching each literal, literals assigned in order, the
+        # trail length at the start of each decision level, and the next
+        # assignment to propagate
+        self.watches = {}
+        self.trail = []
+        self.limits = []
+        self.head = 0
+
+        # Variable of each named symbol and of each gate already encoded
+        self.names = {}
+        self.gates = {}
+        self.constant = None
+
+    def new_variable(self):
+        """
+        Returns a new variable.
+        """
+        self.values.append(None)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        variable = len(self.values) - 1
+        heapq.heappush(self.heap, (0.0, variable))
+        return variable
+
+    def variable(self, name):
+        """
+        Returns the variable of a named symbol, creating it if needed.
+        """
+        if name not in self.names:
+            self.names[name] = self.new_variable()
+        return self.names[name]
+
+    def true(self):
+        """
+        Returns a literal that is always true.
+        """
+        if self.constant is None:
+            self.constant = self.new_variable()
+            self.add_clause([self.constant])
+        return self.constant
+
+    def conjunction(self, literals):
+        """
+        Returns a literal equivalent to the conjunction of `literals`.
+        """
+        literals = sorted(set(literals), key=abs)
+        if any(-literal in literals for literal in literals):
+            return -self.true()
+        if not literals:
+            return self.true()
+        if len(literals) == 1:
+            return literals[0]
+        key = ("and", tuple(literals))
+        if key not in self.gates:
+            gate = self.gates[key] = self.new_variable()
+            for literal in literals:
+                self.add_clause([-gate, literal])
+            self.add_clause([gate] + [-literal for literal in literals])
+        return self.gates[key]
+
+    def disjunction(self, literals):
+        """
+        Returns a literal equivalent to the disjunction of `literals`.
+        """
+        return -self.conjunction([-literal for literal in literals])
+
+    def equivalence(self, left, right):
+        """
+        Returns a literal that is true when `left` and `right` agree.
+        """
+        if left == right:
+            return self.true()
+        if left == -right:
+            return -self.true()
+        left, right = sorted((left, right), key=abs)
+        key = ("iff", left, right)
+        if key not in self.gates:
+            gate = self.gates[key] = self.new_variable()
+            self.add_clause([-gate, -left, right])
+            self.add_clause([-gate, left, -right])
+            self.add_clause([gate, left, right])
+            self.add_clause([gate, -left, -right])
+        return self.gates[key]
+
+    def value(self, literal):
+        """
+        Returns True or False if a literal is assigned, otherwise None.
+        """
+        value = self.values[abs(literal)]
+        if value is None or literal > 0:
+            return value
+        return not value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause that every model must satisfy. Returns False if the
+        clauses can no longer be satisfied.
+        """
+        self.backtrack(0)
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value is True or -literal in clause:
+                return not self.unsatisfiable
+            if value is None and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.unsatisfiable = True
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            if self.propagate() is not None:
+                self.unsatisfiable = True
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+        return not self.unsatisfiable
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses, and the literals in `assumptions`, can
+        all be satisfied, setting self.model to the value of each variable.
+        """
+        self.model = None
+        if self.unsatisfiable:
+            return False
+        self.backtrack(0)
+        assumptions = list(assumptions)
+        pure = self.assign_pure(assumptions)
+        try:
+            return self.search(assumptions)
+        finally:
+            self.backtrack(0)
+            self.unassign_pure(pure)
+
+    def search(self, assumptions):
+        """
+        Decides, propagates and learns from conflicts until every variable
+        is assigned or the clauses are proven unsatisfiable.
+        """
+        conflicts = 0
+        restart = RESTART
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                if not self.limits:
+                    self.unsatisfiable = True
+                    return False
+                learned, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.learned.append(learned)
+                    self.watch(learned)
+                    self.assign(learned[0], learned)
+                self.bump *= DECAY
+                conflicts += 1
+                if conflicts >= restart:
+                    conflicts = 0
+                    restart *= RESTART_GROWTH
+                    self.backtrack(0)
+                continue
+
+            # Assume the given literals first, one decision level each
+            if len(self.limits) < len(assumptions):
+                literal = assumptions[len(self.limits)]
+                value = self.value(literal)
+                if value is False:
+                    return False
+                self.limits.append(len(self.trail))
+                if value is None:
+                    self.assign(literal, None)
+                continue
+
+            variable = self.pick()
+            if variable is None:
+                self.model = list(self.values)
+                return True
+            self.limits.append(len(self.trail))
+            self.assign(variable if self.phases[variable] else -variable, None)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = literal > 0
+        self.levels[variable] = len(self.limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def watch(self, clause):
+        """
+        Watches the first two literals of a clause, which must not be
+        false unless every other literal is.
+        """
+        self.watches.setdefault(clause[0], []).append(clause)
+        self.watches.setdefault(clause[1], []).append(clause)
+
+    def propagate(self):
+        """
+        Assigns every literal left alone in a clause by the assignments
+        not yet propagated. Returns a clause made false, if there is one.
+        """
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches.get(false, [])
+            kept = []
+            for i, clause in enumerate(watching):
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], clause[0]
+                if self.value(clause[0]) is True:
+                    kept.append(clause)
+                    continue
+
+                # Watch another literal that is not false, if there is one
+                for k in range(2, len(clause)):
+                    if self.value(clause[k]) is not False:
+                        clause[1], clause[k] = clause[k], clause[1]
+                        self.watches.setdefault(clause[1], []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if self.value(clause[0]) is False:
+                        kept.extend(watching[i + 1:])
+                        self.watches[false] = kept
+                        return clause
+                    self.assign(clause[0], clause)
+            self.watches[false] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Resolves the conflict clause with the clauses that implied its
+        literals at the current level, back to the first unique implication
+        point. Returns the learned clause, asserting literal first, and the
+        level to backjump to.
+        """
+        level = len(self.limits)
+        learned = [None]
+        seen = set()
+        pending = 0
+        index = len(self.trail) - 1
+        clause = conflict
+        literal = None
+        while True:
+            for other in clause if literal is None else clause[1:]:
+                variable = abs(other)
+                if variable in seen or self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump_activity(variable)
+                if self.levels[variable] == level:
+                    pending += 1
+                else:
+                    learned.append(other)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+        learned[0] = -literal
+
+        # Watch the literal of the highest remaining level second
+        if len(learned) == 1:
+            return learned, 0
+        second = max(range(1, len(learned)),
+                     key=lambda i: self.levels[abs(learned[i])])
+        learned[1], learned[second] = learned[second], learned[1]
+        return learned, self.levels[abs(learned[1])]
+
+    def backtrack(self, level):
+        """
+        Undoes every assignment made above decision `level`.
+        """
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = None
+            self.reasons[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = len(self.trail)
+
+    def bump_activity(self, variable):
+        self.activity[variable] += self.bump
+        if self.activity[variable] > RESCALE:
+            self.activity = [activity / RESCALE
+                             for activity in self.activity]
+            self.bump /= RESCALE
+            self.heap = [(-self.activity[v], v)
+                         for v in range(1, len(self.values))
+                         if self.values[v] is None]
+            heapq.heapify(self.heap)
+        else:
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+
+    def pick(self):
+        """
+        Returns the unassigned variable with the highest activity, or None
+        if every variable is assigned.
+        """
+        while self.heap:
+            activity, variable = heapq.heappop(self.heap)
+            if self.values[variable] is None:
+                return variable
+        for variable in range(1, len(self.values)):
+            if self.values[variable] is None:
+                return variable
+        return None
+
+    def assign_pure(self, assumptions):
+        """
+        Assigns every unassigned variable that occurs with a single sign in
+        the clauses and assumptions that sign, which cannot make any of them
+        false. Returns the pure literals assigned.
+        """
+        occurs = set(assumptions)
+        for clause in self.clauses + self.learned:
+            occurs.update(clause)
+        pure = [literal for literal in occurs
+                if -literal not in occurs and self.value(literal) is None]
+        for literal in pure:
+            self.assign(literal, None)
+        self.head = len(self.trail)
+        return pure
+
+    def unassign_pure(self, pure):
+        """
+        Undoes the pure literal assignments of one call to solve(), since
+        clauses added later may contain their negation.
+        """
+        if not pure:
+            return
+        variables = {abs(literal) for literal in pure}
+        self.trail = [literal for literal in self.trail
+                      if abs(literal) not in variables]
+        for variable in variables:
+            self.values[variable] = None
+            heapq.heappush(self.heap, (-self.activity[variable], variable))
+        self.head = len(self.trail)
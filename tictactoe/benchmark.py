@@ -0,0 +1,168 @@
+"""
+Measures the work done by the tic-tac-toe searches on a fixed suite of
+positions: nodes visited and expanded, terminal checks, evaluations and
+transposition table probes and hits, along with wall time and nodes per
+second, written as JSON. Also counts the positions reachable in a fixed
+number of moves (perft) and times the Monte Carlo player.
+
+Usage: python benchmark.py [--repeat N] [--playouts N] [--output FILE]
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from collections import Counter
+
+import mcts
+import tictactoe as ttt
+
+# Positions searched: name, rows, cols, k, moves played from the empty
+# board, and depth searched, or None to solve the position exactly
+SUITE = [
+    ("3x3 empty", 3, 3, 3, [], None),
+    ("3x3 corner opening", 3, 3, 3, [(0, 0)], None),
+    ("3x3 midgame", 3, 3, 3, [(1, 1), (0, 0), (2, 2)], None),
+    ("4x4 empty", 4, 4, 4, [], 7),
+    ("5x5 k4 opening", 5, 5, 4, [(2, 2), (1, 1)], 5),
+    ("7x7 k4 opening", 7, 7, 4, [(3, 3), (2, 3)], 5),
+    ("15x15 k5 opening", 15, 15, 5, [(7, 7), (6, 8)], 4)
+]
+
+# Boards whose reachable positions are counted: name, rows, cols, k and
+# number of moves
+PERFT = [
+    ("3x3", 3, 3, 3, 9),
+    ("4x4", 4, 4, 4, 5),
+    ("7x7 k4", 7, 7, 4, 3)
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        usage="python benchmark.py [--repeat N] [--playouts N] "
+              "[--output FILE]"
+    )
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="time each search N times, keeping the fastest")
+    parser.add_argument("--playouts", type=int, default=2000,
+                        help="playouts of the Monte Carlo player")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the report to FILE instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "search": [measure(*entry, repeat=args.repeat) for entry in SUITE],
+        "perft": [measure_perft(*board) for board in PERFT],
+        "mcts": measure_mcts(args.playouts)
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+def position(rows, cols, k, moves):
+    """
+    Returns the game and the state after playing `moves` on an empty board.
+    """
+    board = ttt.initial_state(rows, cols)
+    for move in moves:
+        board = ttt.result(board, move)
+    game = ttt.game_for(board, k)
+    return game, game.encode(board)
+
+
+def measure(name, rows, cols, k, moves, depth, repeat=3):
+    """
+    Searches a position from an empty transposition table, once counting
+    the work done and `repeat` times without counting to time it.
+    """
+    game, state = position(rows, cols, k, moves)
+    search = game.max_value if game.turn(state) == ttt.X else game.min_value
+    depth = math.inf if depth is None else depth
+
+    game.transpositions = {}
+    game.counters = Counter()
+    v, best = search(state, depth=depth)
+    counters, game.counters = game.counters, None
+
+    seconds = math.inf
+    for _ in range(repeat):
+        game.transpositions = {}
+        start = time.perf_counter()
+        search(state, depth=depth)
+        seconds = min(seconds, time.perf_counter() - start)
+    game.transpositions = {}
+
+    return {
+        "name": name,
+        "rows": rows,
+        "cols": cols,
+        "k": k,
+        "depth": None if depth == math.inf else depth,
+        "value": v,
+        "best": list(divmod(best, cols)),
+        **{counter: counters[counter] for counter in
+           ("nodes", "expanded", "terminal_checks", "evaluations",
+            "tt_probes", "tt_hits")},
+        "seconds": seconds,
+        "nodes_per_second": counters["nodes"] / seconds
+    }
+
+
+def measure_perft(name, rows, cols, k, depth):
+    """
+    Counts the positions reachable in exactly `depth` moves, stopping at
+    finished games, and times the count.
+    """
+    game, state = position(rows, cols, k, [])
+    start = time.perf_counter()
+    count = perft(game, state, depth)
+    seconds = time.perf_counter() - start
+    return {
+        "name": name,
+        "rows": rows,
+        "cols": cols,
+        "k": k,
+        "depth": depth,
+        "positions": count,
+        "seconds": seconds,
+        "positions_per_second": count / seconds
+    }
+
+
+def perft(game, state, depth):
+    """
+    Returns the number of move sequences of length `depth` from `state`
+    that do not pass through a finished game.
+    """
+    if depth == 0:
+        return 1
+    if game.finished(state):
+        return 0
+    return sum(perft(game, game.play(state, cell), depth - 1)
+               for cell in ttt.cells(game.free(state)))
+
+
+def measure_mcts(playouts):
+    """
+    Times the Monte Carlo player on the empty 3x3 board in one process.
+    """
+    board = ttt.initial_state()
+    start = time.perf_counter()
+    move = mcts.mcts(board, playouts=playouts, workers=1, seed=0)
+    seconds = time.perf_counter() - start
+    return {
+        "playouts": playouts,
+        "best": list(move),
+        "seconds": seconds,
+        "playouts_per_second": playouts / seconds
+    }
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Monte Carlo tree search player for the boards of tictactoe.py.
+
+Each worker process grows its own UCT tree from the same position with
+its share of the playouts (root parallelization), and the visit counts
+of the moves at the root are added up to pick the move.
+"""
+
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import tictactoe as ttt
+
+# Playouts run by default, across all workers
+PLAYOUTS = 20000
+
+# Weight of exploring rarely visited moves against exploiting good ones
+EXPLORATION = math.sqrt(2)
+
+# Playouts between checks of the time budget
+CHECK_EVERY = 64
+
+
+class Node():
+    """
+    Position in a search tree, with the reward collected by the player
+    who moved into it over all playouts through it.
+    """
+    __slots__ = ("state", "parent", "move", "mover", "children", "untried",
+                 "visits", "reward")
+
+    def __init__(self, game, state, parent=None, move=None):
+        self.state = state
+        self.parent = parent
+        self.move = move
+        self.mover = None if parent is None else game.turn(parent.state)
+        self.children = []
+        self.untried = ([] if game.finished(state)
+                        else ttt.cells(game.candidates(state)))
+        self.visits = 0
+        self.reward = 0.0
+
+    def select(self):
+        """
+        Returns the child with the highest upper confidence bound (UCT).
+        """
+        scale = EXPLORATION * math.sqrt(math.log(self.visits))
+        return max(self.children, key=lambda child: (
+            child.reward / child.visits + scale / math.sqrt(child.visits)
+        ))
+
+
+def mcts(board, k=None, playouts=PLAYOUTS, workers=None, budget=None,
+         seed=None):
+    """
+    Returns the action (i, j) for the current player on the board found
+    by `playouts` rounds of Monte Carlo tree search, or fewer if `budget`
+    seconds pass first, shared between `workers` processes, by default
+    one per CPU.
+    """
+    game = ttt.game_for(board, k)
+    state = game.encode(board)
+    if game.finished(state):
+        return None
+    workers = workers or os.cpu_count() or 1
+    shares = [playouts // workers + (i < playouts % workers)
+              for i in range(workers)]
+    tasks = [(game.rows, game.cols, game.k, state, share, budget,
+              None if seed is None else seed + i)
+             for i, share in enumerate(shares) if share]
+
+    if len(tasks) == 1:
+        results = [search(*tasks[0])]
+    else:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context(
+            "fork" if "fork" in methods else None
+        )
+        with context.Pool(len(tasks)) as pool:
+            results = pool.starmap(search, tasks)
+
+    # Merge the statistics of the root moves of every tree
+    visits = {}
+    for result in results:
+        for move, count in result.items():
+            visits[move] = visits.get(move, 0) + count
+    best_move = max(visits, key=visits.get)
+    return divmod(best_move, game.cols)
+
+
+def search(rows, cols, k, state, playouts, budget=None, seed=None):
+    """
+    Runs Monte Carlo tree search from `state` in an m,n,k-game, returning
+    the number of playouts through each move at the root.
+    """
+    game = ttt.games.get((rows, cols, k)) or ttt.Game(rows, cols, k)
+    generator = random.Random(seed)
+    root = Node(game, state)
+    deadline = None if budget is None else time.perf_counter() + budget
+
+    for n in range(playouts):
+        if (deadline is not None and n % CHECK_EVERY == 0
+                and time.perf_counter() > deadline):
+            break
+
+        # Follow the best children down to a node with untried moves
+        node = root
+        while not node.untried and node.children:
+            node = node.select()
+
+        # Add one of its children, and play randomly from there
+        if node.untried:
+            move = node.untried.pop(generator.randrange(len(node.untried)))
+            child = Node(game, game.play(node.state, move), node, move)
+            node.children.append(child)
+            node = child
+        winner = playout(game, node.state, generator)
+
+        # Credit the result to every player who moved on the way down
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.reward += 0.5
+            elif winner == node.mover:
+                node.reward += 1
+            node = node.parent
+
+    return {child.move: child.visits for child in root.children}
+
+
+def playout(game, state, generator):
+    """
+    Plays random moves from `state` until the game ends, returning the
+    winner, if there is one.
+    """
+    winner = game.winner(state)
+    if winner is not None:
+        return winner
+    moves = ttt.cells(game.free(state))
+    generator.shuffle(moves)
+    x, o = state
+    mover = game.turn(state)
+    for move in moves:
+        if mover == ttt.X:
+            x |= 1 << move
+            if game.has_line(x):
+                return ttt.X
+            mover = ttt.O
+        else:
+            o |= 1 << move
+            if game.has_line(o):
+                return ttt.O
+            mover = ttt.X
+    return None
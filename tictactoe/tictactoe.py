@@ -1,161 +1,683 @@
 """
 Tic Tac Toe Player
+
+Boards are lists of rows, as drawn by the runner, of any size: the game
+is won by the first player to get k marks in a row, column or diagonal.
+Internally a state is a pair (x, o) of bitboards: integers with bit
+cols * i + j set when cell (i, j) holds that player's mark. States are
+plain tuples of ints, so copying, comparing and hashing them is free.
 """
 
 import math
-import copy
+import os
+import sys
+import time
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Longest line needed to win by default, as in gomoku
+K = 5
+
+# Seconds the AI may think on boards too large to solve exactly
+BUDGET = 1.0
+
+# Largest board solved exactly when no budget is given
+EXACT_CELLS = 9
+
+# Largest board whose moves are not limited to cells next to a mark
+OPEN_CELLS = 16
+
+# Largest board, or slice of a board, whose bitboards are tabulated
+TABULATED_CELLS = 12
+
+# Weight of each mark on a line that is still open to one player only
+WEIGHT = 4
+
+# Whether a stored value is exact or only a lower or upper bound
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class Timeout(Exception):
+    """
+    Raised inside a search whose time budget has run out, or which was
+    cancelled.
+    """
+
 
-def initial_state():
+class Game():
+    """
+    Rules of an m,n,k-game on a board `rows` high and `cols` wide, won
+    by `k` marks in a row, with the transposition table of its searches.
+    """
+
+    def __init__(self, rows=3, cols=3, k=3):
+        if not 1 <= k <= max(rows, cols):
+            raise Exception("Invalid line length")
+        self.rows = rows
+        self.cols = cols
+        self.k = k
+        self.cells = rows * cols
+        self.full = (1 << self.cells) - 1
+
+        # Step between the cells of a line in each direction, and the
+        # cells a line of k can start from in that direction
+        self.directions = []
+        for di, dj in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            starts = 0
+            for i in range(rows - di * (k - 1)):
+                for j in range(cols):
+                    if 0 <= j + dj * (k - 1) < cols:
+                        starts |= 1 << (i * cols + j)
+            if starts:
+                self.directions.append((di * cols + dj, starts))
+
+        # Bitboards of every line of k cells, the number of lines through
+        # each cell, and whether each bitboard contains one, if few enough
+        self.wins = [
+            sum(1 << (start + step * n) for n in range(k))
+            for step, starts in self.directions for start in cells(starts)
+        ]
+        self.lines = [sum(line >> cell & 1 for line in self.wins)
+                      for cell in range(self.cells)]
+        self.won = None
+        if self.cells <= TABULATED_CELLS:
+            self.won = [self.has_line(marks) for marks in range(self.full + 1)]
+
+        # First and last columns, which marks must not spread across
+        self.left = sum(1 << (i * cols) for i in range(rows))
+        self.right = self.left << (cols - 1)
+
+        # Cells in the order they are read under each rotation and
+        # reflection of the board, and tables applying each of them to
+        # every slice of a bitboard
+        transforms = [
+            lambda i, j: (i, j),
+            lambda i, j: (rows - 1 - i, cols - 1 - j),
+            lambda i, j: (rows - 1 - i, j),
+            lambda i, j: (i, cols - 1 - j)
+        ]
+        if rows == cols:
+            transforms += [
+                lambda i, j: (j, i),
+                lambda i, j: (cols - 1 - j, rows - 1 - i),
+                lambda i, j: (j, rows - 1 - i),
+                lambda i, j: (cols - 1 - j, i)
+            ]
+        self.symmetries = []
+        for transform in transforms:
+            symmetry = []
+            for i in range(rows):
+                for j in range(cols):
+                    a, b = transform(i, j)
+                    symmetry.append(a * cols + b)
+            self.symmetries.append(symmetry)
+        self.width = self.cells if self.cells <= TABULATED_CELLS else 8
+        self.permuted = [self.permutation(symmetry)
+                         for symmetry in self.symmetries]
+
+        # Value, bound, best cell and depth of each canonical state
+        # searched so far, when the current search must stop, and the
+        # event that cancels it
+        self.transpositions = {}
+        self.deadline = None
+        self.cancel = None
+
+        # Work done by searches, counted into a collections.Counter when
+        # one is set here
+        self.counters = None
+
+    def permutation(self, symmetry):
+        """
+        Returns, for each slice of `self.width` bits, the table mapping
+        its bitboards to their image under `symmetry`.
+        """
+        inverse = [0] * self.cells
+        for k, cell in enumerate(symmetry):
+            inverse[cell] = k
+        tables = []
+        for offset in range(0, self.cells, self.width):
+            size = min(self.width, self.cells - offset)
+            tables.append([
+                sum(1 << inverse[offset + bit] for bit in cells(marks))
+                for marks in range(1 << size)
+            ])
+        return tables
+
+    def encode(self, board):
+        """
+        Returns the (x, o) bitboards of a board.
+        """
+        x, o = 0, 0
+        for i, row in enumerate(board):
+            for j, mark in enumerate(row):
+                if mark == X:
+                    x |= 1 << (self.cols * i + j)
+                elif mark == O:
+                    o |= 1 << (self.cols * i + j)
+        return x, o
+
+    def decode(self, state):
+        """
+        Returns the board of (x, o) bitboards.
+        """
+        x, o = state
+        board = []
+        for i in range(self.rows):
+            row = []
+            for j in range(self.cols):
+                cell = self.cols * i + j
+                row.append(X if x >> cell & 1 else O if o >> cell & 1
+                           else EMPTY)
+            board.append(row)
+        return board
+
+    def turn(self, state):
+        """
+        Returns the player who has the next turn in a state.
+        """
+        x, o = state
+        return X if x.bit_count() <= o.bit_count() else O
+
+    def free(self, state):
+        """
+        Returns the bitboard of empty cells.
+        """
+        x, o = state
+        return self.full & ~(x | o)
+
+    def play(self, state, cell):
+        """
+        Returns the state after the player to move marks `cell`.
+        """
+        x, o = state
+        if x.bit_count() <= o.bit_count():
+            return x | 1 << cell, o
+        return x, o | 1 << cell
+
+    def has_line(self, marks):
+        """
+        Returns True if a bitboard contains k marks in a line.
+        """
+        if self.won is not None:
+            return self.won[marks]
+        for step, starts in self.directions:
+            line = marks & starts
+            for n in range(1, self.k):
+                if not line:
+                    break
+                line &= marks >> (step * n)
+            if line:
+                return True
+        return False
+
+    def winner(self, state):
+        """
+        Returns the player with a line in a state, if there is one.
+        """
+        x, o = state
+        if self.has_line(x):
+            return X
+        if self.has_line(o):
+            return O
+        return None
+
+    def finished(self, state):
+        """
+        Returns True if someone has a line or every cell is marked.
+        """
+        x, o = state
+        return x | o == self.full or self.has_line(x) or self.has_line(o)
+
+    def score(self, state):
+        """
+        Returns 1 if X has a line, -1 if O has, 0 otherwise.
+        """
+        x, o = state
+        if self.has_line(x):
+            return 1
+        if self.has_line(o):
+            return -1
+        return 0
+
+    def evaluate(self, state):
+        """
+        Estimates the value of an unfinished state as a number strictly
+        between -1 and 1: every line still open to only one player counts
+        for that player, more the more of it they hold.
+        """
+        x, o = state
+        total = 0
+        for line in self.wins:
+            if not line & o:
+                total += WEIGHT ** (line & x).bit_count() - 1
+            elif not line & x:
+                total -= WEIGHT ** (line & o).bit_count() - 1
+        return total / (len(self.wins) * WEIGHT ** self.k)
+
+    def candidates(self, state):
+        """
+        Returns the bitboard of cells worth trying: every empty cell on
+        small boards, and otherwise the empty cells next to a mark.
+        """
+        x, o = state
+        marks = x | o
+        if self.cells <= OPEN_CELLS or not marks:
+            return self.full & ~marks
+        near = marks | (marks << 1 & ~self.left) | (marks >> 1 & ~self.right)
+        near |= near << self.cols | near >> self.cols
+        return near & self.full & ~marks
+
+    def max_value(self, state, alpha=-math.inf, beta=math.inf,
+                  depth=math.inf):
+        """
+        Picks the cell that produces the highest value of min_value(),
+        skipping cells that cannot change the outcome within (alpha, beta)
+        and estimating states `depth` moves ahead.
+        """
+        counters = self.counters
+        if counters is not None:
+            counters["nodes"] += 1
+            counters["terminal_checks"] += 1
+        if self.finished(state):
+            return self.score(state), None
+        if depth <= 0:
+            if counters is not None:
+                counters["evaluations"] += 1
+            return self.evaluate(state), None
+        self.check_time()
+        key, symmetry, stabilizer = self.canonical(state)
+        v, current_best, alpha, beta = self.probe(key, symmetry, alpha, beta,
+                                                  depth)
+        if v is not None:
+            return v, current_best
+        if counters is not None:
+            counters["expanded"] += 1
+        window = alpha, beta
+        v = -math.inf
+        for cell in self.ordered(state, stabilizer, current_best):
+            current_value, current_move = self.min_value(
+                self.play(state, cell), alpha, beta, depth - 1
+            )
+            if current_value > v:
+                v = current_value
+                current_best = cell
+            alpha = max(alpha, v)
+            if alpha >= beta:
+                break
+        self.store(key, symmetry, v, window, current_best, depth)
+        return v, current_best
+
+    def min_value(self, state, alpha=-math.inf, beta=math.inf,
+                  depth=math.inf):
+        """
+        Picks the cell that produces the lowest value of max_value(),
+        skipping cells that cannot change the outcome within (alpha, beta)
+        and estimating states `depth` moves ahead.
+        """
+        counters = self.counters
+        if counters is not None:
+            counters["nodes"] += 1
+            counters["terminal_checks"] += 1
+        if self.finished(state):
+            return self.score(state), None
+        if depth <= 0:
+            if counters is not None:
+                counters["evaluations"] += 1
+            return self.evaluate(state), None
+        self.check_time()
+        key, symmetry, stabilizer = self.canonical(state)
+        v, current_best, alpha, beta = self.probe(key, symmetry, alpha, beta,
+                                                  depth)
+        if v is not None:
+            return v, current_best
+        if counters is not None:
+            counters["expanded"] += 1
+        window = alpha, beta
+        v = math.inf
+        for cell in self.ordered(state, stabilizer, current_best):
+            current_value, current_move = self.max_value(
+                self.play(state, cell), alpha, beta, depth - 1
+            )
+            if current_value < v:
+                v = current_value
+                current_best = cell
+            beta = min(beta, v)
+            if alpha >= beta:
+                break
+        self.store(key, symmetry, v, window, current_best, depth)
+        return v, current_best
+
+    def deepen(self, state, budget):
+        """
+        Searches one move deeper at a time until the value is proven or
+        `budget` seconds have passed, returning the best cell of the
+        deepest search that finished.
+        """
+        search = self.max_value if self.turn(state) == X else self.min_value
+        best = None
+        self.deadline = time.perf_counter() + budget
+        try:
+            for depth in range(1, self.free(state).bit_count() + 1):
+                v, best = search(state, depth=depth)
+                if abs(v) == 1:
+                    break
+        except Timeout:
+            pass
+        finally:
+            self.deadline = None
+        if best is None:
+            best = self.ordered(state, [], None)[0]
+        return best
+
+    def check_time(self):
+        """
+        Raises Timeout if the current search has run out of time or has
+        been cancelled.
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise Timeout
+        if self.cancel is not None and self.cancel.is_set():
+            raise Timeout
+
+    def canonical(self, state):
+        """
+        Returns the smallest of the rotations and reflections of a state,
+        the symmetry that produces it, and the symmetries that leave the
+        state unchanged.
+        """
+        images = [((self.permute(state[0], tables),
+                    self.permute(state[1], tables)), symmetry)
+                  for tables, symmetry in zip(self.permuted, self.symmetries)]
+        key, symmetry = min(images)
+        return key, symmetry, [s for image, s in images if image == state]
+
+    def permute(self, marks, tables):
+        """
+        Returns the image of a bitboard under the symmetry of `tables`.
+        """
+        image = 0
+        mask = (1 << self.width) - 1
+        for table in tables:
+            image |= table[marks & mask]
+            marks >>= self.width
+        return image
+
+    def ordered(self, state, stabilizer, first):
+        """
+        Returns the candidate cells that are not a rotation or reflection
+        of another, given the symmetries that leave the state unchanged,
+        with `first`, the best cell found before, in front, followed by
+        the cells on the most winning lines.
+        """
+        moves = [cell for cell in cells(self.candidates(state))
+                 if all(symmetry[cell] >= cell for symmetry in stabilizer)]
+        return sorted(moves, key=lambda cell: (cell != first,
+                                               -self.lines[cell]))
+
+    def probe(self, key, symmetry, alpha, beta, depth):
+        """
+        Looks up a canonical state in the transposition table.
+
+        Returns (v, move, alpha, beta), where v is the stored value if it
+        was searched at least `depth` moves deep and settles the state
+        within (alpha, beta) and None otherwise, move is the best cell
+        found before, if any, and the window is narrowed by the stored
+        bound.
+        """
+        entry = self.transpositions.get(key)
+        if self.counters is not None:
+            self.counters["tt_probes"] += 1
+        if entry is None:
+            return None, None, alpha, beta
+        v, bound, cell, searched = entry
+        move = symmetry[cell]
+        if searched < depth:
+            return None, move, alpha, beta
+        if bound == LOWER:
+            alpha = max(alpha, v)
+        elif bound == UPPER:
+            beta = min(beta, v)
+        if bound == EXACT or alpha >= beta:
+            if self.counters is not None:
+                self.counters["tt_hits"] += 1
+            return v, move, alpha, beta
+        return None, move, alpha, beta
+
+    def store(self, key, symmetry, v, window, move, depth):
+        """
+        Records the value searched `depth` moves deep with `window` for a
+        canonical state: exact if it fell inside the window, otherwise a
+        bound on the true value.
+        """
+        alpha, beta = window
+        if v <= alpha:
+            bound = UPPER
+        elif v >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.transpositions[key] = v, bound, symmetry.index(move), depth
+
+
+def cells(bits):
+    """
+    Returns the cells set in a bitboard, lowest first.
+    """
+    found = []
+    while bits:
+        low = bits & -bits
+        found.append(low.bit_length() - 1)
+        bits ^= low
+    return found
+
+
+# Standard 3x3 tic-tac-toe, and every other game played so far, by
+# rows, columns and line length
+CLASSIC = Game()
+games = {(3, 3, 3): CLASSIC}
+
+
+def game_for(board, k=None):
+    """
+    Returns the game played on a board with lines of `k`, by default the
+    shorter side of the board up to K.
+    """
+    rows, cols = len(board), len(board[0])
+    if k is None:
+        k = min(rows, cols, K)
+    if (rows, cols, k) not in games:
+        games[rows, cols, k] = Game(rows, cols, k)
+    return games[rows, cols, k]
+
+
+def initial_state(rows=3, cols=3):
     """
     Returns starting state of the board.
     """
-    return [[EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY],
-            [EMPTY, EMPTY, EMPTY]]
+    return [[EMPTY] * cols for _ in range(rows)]
 
 
 def player(board):
     """
     Returns player who has the next turn on a board.
     """
-    moves = counter(board)
-    if moves[0] == moves[1]:
-        return X
-    if moves[0] > moves[1]:
-        return O
-    return X
+    game = game_for(board)
+    return game.turn(game.encode(board))
 
 
-def actions(board):
+def actions(board, k=None):
     """
     Returns set of all possible actions (i, j) available on the board.
     """
-    if terminal(board) == True:
+    game = game_for(board, k)
+    state = game.encode(board)
+    if game.finished(state):
         return None
-    free = set()
-    for i in range(3):
-        for j in range(3):
-            if board[i][j] == EMPTY:
-                free.add((i, j))
-    return free
+    return {divmod(cell, game.cols) for cell in cells(game.free(state))}
 
 
 def result(board, action):
     """
     Returns the board that results from making move (i, j) on the board.
     """
-    mark = player(board)
-    board_copy = copy.deepcopy(board)
-    if board_copy[action[0]][action[1]] != EMPTY:
+    game = game_for(board)
+    state = game.encode(board)
+    i, j = action
+    if not (0 <= i < game.rows and 0 <= j < game.cols
+            and game.free(state) >> (i * game.cols + j) & 1):
         raise Exception("Invalid move")
-    board_copy[action[0]][action[1]] = mark
-    return board_copy
+    return game.decode(game.play(state, i * game.cols + j))
 
 
-def winner(board):
+def winner(board, k=None):
     """
     Returns the winner of the game, if there is one.
     """
-    for item in board:
-        if item.count('X') == 3 or item.count('O') == 3:
-            return item[0]
-    for i in range(3):
-        if board[0][i] == board[1][i] == board[2][i] and board[0][i] != EMPTY:
-            return board[0][i]
-    if board[0][0] == board[1][1] == board[2][2] and board[1][1] != EMPTY:
-        return board[1][1]
-    if board[0][2] == board[1][1] == board[2][0] and board[1][1] != EMPTY:
-        return board[1][1]
-    return None
+    game = game_for(board, k)
+    return game.winner(game.encode(board))
 
 
-def terminal(board):
+def terminal(board, k=None):
     """
     Returns True if game is over, False otherwise.
     """
-    win = winner(board)
-    if win == X or win == O:
-        return True
-    if win == None:
-        for row in board:
-            if EMPTY in row:
-                return False
-        return True
-    
+    game = game_for(board, k)
+    return game.finished(game.encode(board))
+
 
-def utility(board):
+def utility(board, k=None):
     """
     Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
     """
-    win = winner(board)
-    if win == X:
-        return 1
-    if win == O:
-        return -1
-    return 0
+    game = game_for(board, k)
+    return game.score(game.encode(board))
 
 
-def minimax(board):
+def minimax(board, k=None, budget=None, cancel=None):
     """
     Returns the optimal action (i, j) for the current player on the board.
+
+    Boards of up to EXACT_CELLS cells are solved exactly unless a budget
+    is given. Larger boards are searched deeper and deeper for `budget`
+    seconds, BUDGET by default, returning the best action found in time.
+
+    Setting `cancel`, a threading.Event, from another thread stops the
+    search early; its result should then be ignored, and may be None.
     """
-    if terminal(board) == True:
+    game = game_for(board, k)
+    state = game.encode(board)
+    if game.finished(state):
         return None
-    if player(board) == X:
-        v, best_move = max_value(board)
-        return best_move
-    v, best_move = min_value(board)
-    return best_move
+    if game is CLASSIC:
+        entry = lookup(state)
+        if entry is not None:
+            return divmod(entry[1], 3)
+    game.cancel = cancel
+    try:
+        if budget is None and game.cells <= EXACT_CELLS:
+            if game.turn(state) == X:
+                v, best_move = game.max_value(state)
+            else:
+                v, best_move = game.min_value(state)
+        else:
+            best_move = game.deepen(state,
+                                    BUDGET if budget is None else budget)
+    except Timeout:
+        return None
+    finally:
+        game.cancel = None
+    return divmod(best_move, game.cols)
 
 
 def counter(board):
     """
-    Returns a tuple (i, j), where 'i' stands for the number of 'X' moves 
+    Returns a tuple (i, j), where 'i' stands for the number of 'X' moves
     and 'j' for 'O' moves.
     """
-    i, j = 0, 0
-    for el in board:
-        i += el.count(X)
-        j += el.count(O)
-    return i, j
-
-
-def max_value(board):
-    """
-    Picks action in actions that produces the highest value of min_value().
-    """
-    if terminal(board) == True:
-        return utility(board), None
-    v = float('-inf')
-    current_best = None
-    for action in actions(board):
-        current_value, current_move = min_value(result(board, action))
-        if current_value > v:
-            v = current_value
-            current_best = action
-            if v == 1:
-                return v, current_best
-    return v, current_best
-
-
-def min_value(board):
-    """
-    Picks action in actions that produces the lowest value of max_value().
-    """
-    if terminal(board) == True:
-        return utility(board), None
-    v = float('inf')
-    current_best = None
-    for action in actions(board):
-        current_value, current_move = max_value(result(board, action))
-        if current_value < v:
-            v = current_value
-            current_best = action
-            if v == -1:
-                return v, current_best
-    return v, current_best
\ No newline at end of file
+    x, o = game_for(board).encode(board)
+    return x.bit_count(), o.bit_count()
+
+
+# File holding the perfect-play table, built by running this module
+TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                     "tictactoe.table")
+
+# Base-3 value of each bitboard, so that a state is numbered by
+# TERNARY[x] + 2 * TERNARY[o]
+TERNARY = [sum(3 ** cell for cell in cells(marks))
+           for marks in range(CLASSIC.full + 1)]
+
+# Table entry of states that are finished or unreachable
+UNKNOWN = 0xFF
+
+
+def lookup(state):
+    """
+    Returns (value, cell) of perfect play from a classic state, or None if
+    the perfect-play table is missing or does not cover the state.
+    """
+    if table is None:
+        return None
+    entry = table[TERNARY[state[0]] + 2 * TERNARY[state[1]]]
+    if entry == UNKNOWN:
+        return None
+    return (entry >> 4) - 1, entry & 0xF
+
+
+def solve():
+    """
+    Returns the perfect-play table: one byte per state numbered in base 3,
+    holding the value plus one in its high bits and the best cell in its
+    low bits for every reachable state that is not finished.
+    """
+    solved = bytearray([UNKNOWN]) * 3 ** 9
+    seen = set()
+    stack = [(0, 0)]
+    while stack:
+        state = stack.pop()
+        if state in seen or CLASSIC.finished(state):
+            continue
+        seen.add(state)
+        if CLASSIC.turn(state) == X:
+            v, cell = CLASSIC.max_value(state)
+        else:
+            v, cell = CLASSIC.min_value(state)
+        index = TERNARY[state[0]] + 2 * TERNARY[state[1]]
+        solved[index] = (v + 1) << 4 | cell
+        stack.extend(CLASSIC.play(state, cell)
+                     for cell in cells(CLASSIC.free(state)))
+    return solved
+
+
+def load_table(path=TABLE):
+    """
+    Reads the perfect-play table, returning None if it is missing or
+    the wrong size.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) != 3 ** 9:
+        return None
+    return data
+
+
+def main():
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python tictactoe.py [table]")
+    path = sys.argv[1] if len(sys.argv) == 2 else TABLE
+    solved = solve()
+    with open(path, "wb") as f:
+        f.write(solved)
+    print(f"Solved {3 ** 9 - solved.count(UNKNOWN)} positions into {path}")
+
+
+# Value and best cell of every classic state, if the table has been built
+table = load_table()
+
+if __name__ == "__main__":
+    main()